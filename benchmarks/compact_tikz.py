@@ -0,0 +1,49 @@
+"""Size and compile time of the tex code, default against compact.
+
+Run from the repository root with
+    python -m benchmarks.compact_tikz [number of annotations ...]
+Compile times are only measured if pdflatex is installed.
+"""
+from pathlib import Path
+import shutil
+from subprocess import run, DEVNULL
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+from matplatex import save
+from tests.latex_test_code import MWE
+
+from .figures import annotated_figure
+
+
+def compile_time(directory: Path, document: str = MWE) -> float:
+    """Seconds needed to compile a document including figure.tex,
+    by default the MWE."""
+    (directory / 'document.tex').write_text(document)
+    start = time.perf_counter()
+    run(['pdflatex', '-interaction=batchmode', 'document.tex'],
+        cwd=directory, stdout=DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def main(sizes):
+    has_pdflatex = shutil.which('pdflatex') is not None
+    print(f"{'annotations':>12} {'mode':>8} {'bytes':>10} {'compile':>8}")
+    for size in sizes:
+        fig = annotated_figure(size)
+        for compact in False, True:
+            with TemporaryDirectory() as directory:
+                directory = Path(directory)
+                save(fig, directory / 'figure', compact=compact, verbose=0)
+                n_bytes = (directory / 'figure.tex').stat().st_size
+                if has_pdflatex:
+                    seconds = f"{compile_time(directory):7.2f}s"
+                else:
+                    seconds = "-"
+            mode = 'compact' if compact else 'default'
+            print(f"{size:12d} {mode:>8} {n_bytes:10d} {seconds:>8}")
+    if not has_pdflatex:
+        print("pdflatex not found, compile times not measured.")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000])
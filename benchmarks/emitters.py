@@ -0,0 +1,50 @@
+"""Size and compile time of the tex code written by each emitter.
+
+Run from the repository root with
+    python -m benchmarks.emitters [number of annotations ...]
+The tikz code is compiled in a document loading tikz, and the pgf code
+in one loading only pgf. Compile times are only measured if pdflatex
+is installed.
+"""
+from pathlib import Path
+import shutil
+import sys
+from tempfile import TemporaryDirectory
+
+from matplatex import save
+from tests.latex_test_code import MWE
+
+from .compact_tikz import compile_time
+from .figures import annotated_figure
+
+STYLES = {
+    'tikz': {},
+    'tikz-compact': {'compact': True},
+    'pgf': {'emitter': 'pgf'},
+    'pgf-compact': {'emitter': 'pgf', 'compact': True},
+    }
+
+
+def main(sizes):
+    has_pdflatex = shutil.which('pdflatex') is not None
+    print(f"{'annotations':>12} {'emitter':>13} {'bytes':>10} {'compile':>8}")
+    for size in sizes:
+        fig = annotated_figure(size)
+        for name, options in STYLES.items():
+            document = MWE
+            if options.get('emitter') == 'pgf':
+                document = MWE.replace(r'\usepackage{tikz}', r'\usepackage{pgf}')
+            with TemporaryDirectory() as directory:
+                directory = Path(directory)
+                save(fig, directory / 'figure', verbose=0, **options)
+                n_bytes = (directory / 'figure.tex').stat().st_size
+                if has_pdflatex:
+                    seconds = f"{compile_time(directory, document):7.2f}s"
+                else:
+                    seconds = "-"
+            print(f"{size:12d} {name:>13} {n_bytes:10d} {seconds:>8}")
+    if not has_pdflatex:
+        print("pdflatex not found, compile times not measured.")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000])
@@ -0,0 +1,33 @@
+"""Peak memory of text extraction, FigureText sets against TextRecords.
+
+Run from the repository root with
+    python -m benchmarks.extraction_memory [number of annotations ...]
+"""
+import sys
+import tracemalloc
+
+import matplatex.tools as tools
+
+from .figures import annotated_figure
+
+
+def peak_memory(function, *args) -> int:
+    """Peak memory allocated while calling function, in bytes."""
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+def main(sizes):
+    print(f"{'annotations':>12} {'FigureText':>12} {'TextRecord':>12}")
+    for size in sizes:
+        fig = annotated_figure(size)
+        fig.draw_without_rendering()
+        figure_text = peak_memory(tools.extract_text, fig)
+        records = peak_memory(tools.extract_records, fig)
+        print(f"{size:12d} {figure_text/2**20:10.1f}MB {records/2**20:10.1f}MB")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000])
@@ -0,0 +1,63 @@
+"""Synthetic figures for the benchmarks."""
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+
+
+def annotated_figure(n_text: int, /, seed: int = 0) -> plt.Figure:
+    """A single Axes with n_text annotations at random positions."""
+    return synthetic_figure(n_annotations=n_text, seed=seed)
+
+def synthetic_figure(
+        *,
+        n_axes: int = 1,
+        n_ticks: int | None = None,
+        n_annotations: int = 0,
+        n_points: int = 0,
+        n_artists: int = 0,
+        kind: str = 'line',
+        seed: int = 0
+        ) -> plt.Figure:
+    """A figure whose size in each dimension can be scaled separately.
+
+    Keyword arguments:
+    n_axes          Number of Axes, in a square grid.
+    n_ticks         Number of labelled ticks on each axis. If None,
+                    matplotlib chooses.
+    n_annotations   Number of annotations spread over the Axes.
+    n_points        Number of data points in each Axes.
+    n_artists       Number of separate small lines and rectangles, which
+                    contain no text, spread over the Axes.
+    kind            'line' or 'scatter', how to plot the data points.
+    seed            Seed for the random positions and data.
+    """
+    rng = np.random.default_rng(seed)
+    n_columns = int(np.ceil(np.sqrt(n_axes)))
+    n_rows = int(np.ceil(n_axes/n_columns))
+    fig = plt.Figure(figsize=(3*n_columns, 2.5*n_rows))
+    axes = [fig.add_subplot(n_rows, n_columns, i+1) for i in range(n_axes)]
+    for ax in axes:
+        if n_points:
+            x = np.linspace(0, 1, n_points)
+            y = rng.random(n_points)
+            if kind == 'scatter':
+                ax.scatter(x, y, s=1)
+            else:
+                ax.plot(x, y, lw=0.5)
+        if n_ticks is not None:
+            ticks = np.linspace(0, 1, n_ticks)
+            labels = [f"{tick:.3f}" for tick in ticks]
+            ax.set_xticks(ticks, labels, fontsize=2, rotation=90)
+            ax.set_yticks(ticks, labels, fontsize=2)
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+    for i, (x, y) in enumerate(rng.random((n_artists, 2))):
+        ax = axes[i % n_axes]
+        if i % 2:
+            ax.add_line(Line2D([x, x + 0.01], [y, y]))
+        else:
+            ax.add_patch(Rectangle((x, y), 0.01, 0.01))
+    for i, (x, y) in enumerate(rng.random((n_annotations, 2))):
+        axes[i % n_axes].annotate(f"{i}", (x, y), fontsize=6)
+    return fig
@@ -0,0 +1,53 @@
+"""Time to import matplatex, against a budget.
+
+Run from the repository root with
+    python -m benchmarks.import_time
+Each statement is run in a fresh interpreter with python -X importtime,
+and the cumulative import time of the modules it imports is reported,
+as the best of several runs. The exit status is 1 if a statement
+exceeds its budget.
+"""
+from subprocess import run
+import sys
+
+# Seconds. Importing the package must not import matplotlib, while
+# getting save imports matplotlib.figure, but not pyplot.
+BUDGETS = {
+    'import matplatex': 0.05,
+    'from matplatex import save': 2.0,
+    }
+REPEAT = 5
+
+
+def top_level_imports(statement: str) -> dict[str, float]:
+    """Cumulative time of each top level import made when running
+    statement in a fresh interpreter, including interpreter startup."""
+    result = run([sys.executable, '-X', 'importtime', '-c', statement],
+                 capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        if not name.startswith('  '):  # Nested imports are indented.
+            times[name.strip()] = int(cumulative)/1e6
+    return times
+
+def import_time(statement: str) -> float:
+    """Import time of statement, without the interpreter startup."""
+    startup = top_level_imports('pass')
+    return sum(seconds for name, seconds in top_level_imports(statement).items()
+               if name not in startup)
+
+def main():
+    over_budget = False
+    for statement, budget in BUDGETS.items():
+        seconds = min(import_time(statement) for _ in range(REPEAT))
+        status = 'ok' if seconds <= budget else 'OVER BUDGET'
+        over_budget |= seconds > budget
+        print(f"{statement:30} {seconds*1000:8.1f}ms "
+              f"(budget {budget*1000:.0f}ms) {status}")
+    return int(over_budget)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Size of the graphics files with and without optimize=True.
+
+Run from the repository root with
+    python -m benchmarks.optimize [format ...]
+Every synthetic figure is saved in each format both ways, and the
+sizes and the bytes saved are printed.
+"""
+from functools import partial
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+
+import matplotlib.pyplot as plt
+
+from matplatex import save
+
+from .figures import synthetic_figure
+
+CASES = {
+    'axes-1': partial(synthetic_figure),
+    'axes-25': partial(synthetic_figure, n_axes=25),
+    'line-10000': partial(synthetic_figure, n_points=10_000),
+    'scatter-10000': partial(
+        synthetic_figure, n_points=10_000, kind='scatter'),
+    }
+
+
+def graphics_size(make_figure, directory: Path, format: str, **options):
+    fig = make_figure()
+    save(fig, directory / 'figure', format=format, verbose=0, **options)
+    plt.close(fig)
+    return (directory / f'figure.gfx.{format}').stat().st_size
+
+def main(formats):
+    print(f"{'case':>14} {'format':>6} {'default':>9} {'optimized':>9} "
+          f"{'saved':>9}")
+    with TemporaryDirectory() as directory:
+        for name, make_figure in CASES.items():
+            for format in formats:
+                default = graphics_size(make_figure, Path(directory), format)
+                optimized = graphics_size(
+                    make_figure, Path(directory), format, optimize=True)
+                saved = default - optimized
+                print(f"{name:>14} {format:>6} {default:9} {optimized:9} "
+                      f"{saved:9} ({saved/default:.1%})")
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or ['pdf', 'svg', 'png'])
@@ -0,0 +1,57 @@
+"""Time of translating text to LaTeX, str.replace loop against Sanitizer.
+
+Run from the repository root with
+    python -m benchmarks.sanitize [number of labels]
+Labels are repeated as tick labels are across axes, and the table is
+the default math mode table extended with escapes and further made up
+entries, up to several hundred keys.
+"""
+import sys
+import time
+
+from matplatex.sanitize import Sanitizer
+from matplatex.settings import Replacements
+
+ESCAPES = {'%': r'\%', '&': r'\&', '#': r'\#', '_': r'\_', '$': r'\$'}
+
+
+def replace_loop(string: str, replacements: dict) -> str:
+    """The previous implementation, one str.replace per key."""
+    for key, val in replacements.items():
+        string = string.replace(key, val)
+    return string
+
+def labels(n_labels: int) -> list[str]:
+    return [rf"$\mathdefault{{{i % 200 / 10:.1f}}}$ − {i % 50}%"
+            for i in range(n_labels)]
+
+def best_time(function, strings, repeat=5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for string in strings:
+            function(string)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(n_labels: int):
+    strings = labels(n_labels)
+    print(f"{n_labels} labels")
+    print(f"{'keys':>6} {'str.replace':>12} {'Sanitizer':>10} {'cached':>8}")
+    for n_extra in 0, 10, 100, 500:
+        table = Replacements.math_mode | ESCAPES | {
+            f'\\unused{i}': f'u{i}' for i in range(n_extra)}
+        loop = best_time(lambda string: replace_loop(string, table), strings)
+        # The first pass includes compiling the table and filling the
+        # cache, later passes only hit the cache.
+        start = time.perf_counter()
+        sanitizer = Sanitizer(table)
+        for string in strings:
+            sanitizer(string)
+        single = time.perf_counter() - start
+        cached = best_time(sanitizer, strings)
+        print(f"{len(table):6} {loop*1000:10.1f}ms {single*1000:8.1f}ms "
+              f"{cached*1000:6.1f}ms")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
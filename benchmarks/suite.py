@@ -0,0 +1,197 @@
+"""Benchmark suite for the phases of matplatex.save.
+
+Run from the repository root with
+    python -m benchmarks [options]
+See python -m benchmarks --help for the options.
+
+Each case is a synthetic figure. For each case, every phase of save is
+timed separately, taking the best of several repeats, and the peak
+memory of a whole save is measured with tracemalloc. The results can
+be stored as a local baseline, which later runs are compared against.
+"""
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+import json
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+import time
+import tracemalloc
+
+import matplotlib.pyplot as plt
+
+from matplatex import save
+from matplatex.latex_input import LaTeXinput
+from matplatex.tools import (
+    extract_records, render_without_text, walk_text, write_tex)
+
+from .figures import synthetic_figure
+
+BASELINE = Path(__file__).with_name('baseline.json')
+
+CASES = {
+    'axes-1': partial(synthetic_figure),
+    'axes-25': partial(synthetic_figure, n_axes=25),
+    'ticks-100': partial(synthetic_figure, n_ticks=100),
+    'ticks-1000': partial(synthetic_figure, n_ticks=1000),
+    'annotations-10': partial(synthetic_figure, n_annotations=10),
+    'annotations-1000': partial(synthetic_figure, n_annotations=1000),
+    'annotations-10000': partial(synthetic_figure, n_annotations=10_000),
+    'line-100000': partial(synthetic_figure, n_points=100_000),
+    'scatter-10000': partial(
+        synthetic_figure, n_points=10_000, kind='scatter'),
+    }
+LARGE_CASES = {
+    'annotations-100000': partial(synthetic_figure, n_annotations=100_000),
+    'line-1000000': partial(synthetic_figure, n_points=1_000_000),
+    'scatter-100000': partial(
+        synthetic_figure, n_points=100_000, kind='scatter'),
+    }
+# Phases faster than this are not checked for regressions, as they
+# are dominated by noise.
+MIN_SECONDS = 0.005
+
+
+@contextmanager
+def timer(times: list):
+    start = time.perf_counter()
+    yield
+    times.append(time.perf_counter() - start)
+
+def time_phases(make_figure, directory: Path, repeat: int) -> dict:
+    """Best time of each phase of save, in seconds.
+
+    The phases are timed as save does them, except that the figure is
+    drawn once without output before savefig, so that the draw can be
+    timed separately. The draw is timed on a fresh figure. save is
+    also timed as a whole, on another fresh figure.
+    """
+    times = defaultdict(list)
+    graphics_path = directory / 'figure.gfx.pdf'
+    for _ in range(repeat):
+        fig = make_figure()
+        with timer(times['draw']):
+            fig.draw_without_rendering()
+        with timer(times['walk']):
+            list(walk_text(fig))
+        with timer(times['extract']):
+            records = extract_records(fig)
+        output = LaTeXinput(
+            widthcommand=r'\figurewidth', externalize=False, trim=False)
+        with timer(times['write_tex']):
+            write_tex(output, fig, graphics=Path(graphics_path.name),
+                      text=records)
+        with timer(times['write']):
+            output.write(directory / 'figure.tex')
+        with timer(times['savefig']), render_without_text(fig):
+            fig.savefig(graphics_path)
+        plt.close(fig)
+        fig = make_figure()
+        with timer(times['save']):
+            save(fig, directory / 'figure', verbose=0)
+        plt.close(fig)
+    return {phase: min(phase_times) for phase, phase_times in times.items()}
+
+def peak_memory(make_figure, directory: Path) -> int:
+    """Peak memory allocated by save, in bytes.
+
+    Only memory allocated through Python is seen by tracemalloc, so
+    e.g. the pixel buffers of the Agg renderer are not included.
+    """
+    fig = make_figure()
+    tracemalloc.start()
+    save(fig, directory / 'figure', verbose=0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    plt.close(fig)
+    return peak
+
+def run_cases(cases: dict, repeat: int) -> dict:
+    with TemporaryDirectory() as directory:  # Load the backends first.
+        save(synthetic_figure(), Path(directory) / 'figure', verbose=0)
+    results = {}
+    for name, make_figure in cases.items():
+        with TemporaryDirectory() as directory:
+            result = time_phases(make_figure, Path(directory), repeat)
+            result['peak_memory'] = peak_memory(make_figure, Path(directory))
+        results[name] = result
+        print_result(name, result)
+    return results
+
+def print_result(name: str, result: dict):
+    phases = ', '.join(f"{phase} {seconds*1000:.1f}ms"
+                       for phase, seconds in result.items()
+                       if phase != 'peak_memory')
+    print(f"{name}: {phases}, "
+          f"peak memory {result['peak_memory']/2**20:.1f}MB")
+
+def find_regressions(
+        results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every result which is worse than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        for key, value in result.items():
+            reference = baseline.get(name, {}).get(key)
+            if reference is None:
+                continue
+            if key != 'peak_memory' and reference < MIN_SECONDS:
+                continue
+            if value > tolerance*reference:
+                regressions.append(
+                    f"{name} {key}: {value:.4g} against {reference:.4g}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Time the phases of matplatex.save on synthetic figures.")
+    parser.add_argument(
+        'cases', nargs='*',
+        help="Cases to run. Default: all except the large ones.")
+    parser.add_argument(
+        '--large', action='store_true',
+        help="Also run the large cases, up to 100k annotations.")
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="Take the best time of this many runs. Default: 3.")
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help=f"Store the results as the baseline in {BASELINE.name}.")
+    parser.add_argument(
+        '--tolerance', type=float, default=1.5,
+        help="Report a regression when a result is this many times "
+             "the baseline. Default: 1.5.")
+    args = parser.parse_args(argv)
+
+    all_cases = CASES | LARGE_CASES
+    if args.cases:
+        unknown = set(args.cases) - set(all_cases)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+        cases = {name: all_cases[name] for name in args.cases}
+    else:
+        cases = all_cases if args.large else CASES
+    results = run_cases(cases, args.repeat)
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        BASELINE.write_text(json.dumps(baseline | results, indent=2))
+        print(f"Baseline written to {BASELINE}")
+        return 0
+    if not BASELINE.exists():
+        print("No baseline to compare with, store one with --save-baseline.")
+        return 0
+    regressions = find_regressions(
+        results, json.loads(BASELINE.read_text()), args.tolerance)
+    if regressions:
+        print("\nRegressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
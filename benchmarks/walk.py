@@ -0,0 +1,57 @@
+"""Time of finding the text of a figure, full walk against pruned walk.
+
+Run from the repository root with
+    python -m benchmarks.walk [number of artists ...]
+The figures have a fixed amount of text and a growing number of lines
+and patches, which contain no text.
+"""
+import sys
+import time
+
+import matplotlib.pyplot as plt
+
+from matplatex.tools import walk_text
+
+from .figures import synthetic_figure
+
+
+def full_walk(fig):
+    """The previous walk, which descends into every artist."""
+    stack = [iter(fig.get_children())]
+    current_ax = [None]
+    while stack:
+        try:
+            child = next(stack[-1])
+            if isinstance(child, plt.Text):
+                yield child, current_ax[-1]
+            else:
+                if isinstance(child, plt.Axes):
+                    current_ax.append(child)
+                else:
+                    current_ax.append(current_ax[-1])
+                stack.append(iter(child.get_children()))
+        except StopIteration:
+            if current_ax[-1] != None:
+                current_ax.pop()
+            stack.pop()
+
+def best_time(walk, fig, repeat=5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = list(walk(fig))
+        times.append(time.perf_counter() - start)
+    return min(times), len(texts)
+
+def main(sizes):
+    print(f"{'artists':>8} {'texts':>6} {'full':>9} {'pruned':>9}")
+    for size in sizes:
+        fig = synthetic_figure(n_axes=4, n_artists=size)
+        fig.draw_without_rendering()
+        full, n_full = best_time(full_walk, fig)
+        pruned, n_pruned = best_time(walk_text, fig)
+        assert n_full == n_pruned
+        print(f"{size:8} {n_pruned:6} {full*1000:7.2f}ms {pruned*1000:7.2f}ms")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [0, 1000, 10_000, 100_000])
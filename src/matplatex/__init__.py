@@ -1,3 +1,37 @@
 # Import the functions and classes the user needs.
-from .ui import save, print_family_tree
-from .journal_settings import EPJ, PRC, Beamer
+# The modules are only imported when one of their names is first used,
+# so that importing matplatex does not import matplotlib.
+import importlib
+
+_lazy_imports = {
+    'save': '.ui',
+    'save_many': '.ui',
+    'save_async': '.ui',
+    'save_frames': '.ui',
+    'asave': '.ui',
+    'print_family_tree': '.ui',
+    'SaveReport': '.report',
+    'retex': '.sidecar',
+    'compile_externalized': '.build',
+    'MemoryBundle': '.bundle',
+    'ZipBundle': '.bundle',
+    'TarBundle': '.bundle',
+    'EPJ': '.journal_settings',
+    'PRC': '.journal_settings',
+    'Beamer': '.journal_settings',
+    }
+
+__all__ = list(_lazy_imports)
+
+def __getattr__(name):
+    try:
+        module = _lazy_imports[name]
+    except KeyError:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted({*globals(), *_lazy_imports})
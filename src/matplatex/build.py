@@ -0,0 +1,207 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# Compile the externalized matplatex figures of a LaTeX document.
+
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import re
+import subprocess
+
+from .latex_input import atomic_open, read_json
+
+PDFLATEX = ('pdflatex', '-interaction=nonstopmode', '-halt-on-error')
+
+_MATPLATEX_HEADER = "% This file was automatically generated by matpLaTeX"
+_comment = re.compile(r'(?<!\\)%.*')
+_input = re.compile(r'\\(?:input|include)\s*\{([^}]*)\}')
+_import = re.compile(r'\\(sub)?import\*?\s*\{([^}]*)\}\s*\{([^}]*)\}')
+_graphicnamed = re.compile(r'\\beginpgfgraphicnamed\{([^}]*)\}')
+_includegraphics = re.compile(r'\\includegraphics\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}')
+
+
+@dataclass(frozen=True)
+class ExternalizedFigure:
+    """A matplatex figure saved with externalize=True.
+
+    Attributes:
+    jobname     The name given to \\beginpgfgraphicnamed, which is also
+                the jobname that compiles it, e.g. 'figure.gfx_xt'.
+    tex         Path of the tex file written by matplatex.
+    graphics    Path of the graphics file included by the tex file.
+    """
+    jobname: str
+    tex: Path
+    graphics: Path
+
+
+@dataclass
+class BuildSummary:
+    """The outcome of compile_externalized.
+
+    Attributes:
+    compiled    Job names of the figures which were compiled.
+    skipped     Job names of the figures which were up to date.
+    failed      Dict mapping job names of the figures which failed to
+                the exception raised when compiling them.
+    """
+    compiled: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, BaseException] = field(default_factory=dict)
+
+
+def find_externalized(document: str | Path, /) -> list[ExternalizedFigure]:
+    """Find the externalized matplatex figures input by a document.
+
+    Follows \\input, \\include, \\import and \\subimport recursively
+    from the document, and returns every file written by matplatex
+    which contains a \\beginpgfgraphicnamed, in the order they appear.
+    Paths are resolved as LaTeX does: \\input and \\include relative
+    to the directory of the document, or of the enclosing \\import,
+    \\import relative to the directory of the document and \\subimport
+    relative to the enclosing \\import. Commented out lines are ignored.
+    """
+    figures = []
+    seen = set()
+    root = Path(document).resolve().parent
+    for path in _walk_inputs(Path(document), root, root, seen):
+        source = path.read_text(encoding='utf-8')
+        if not source.startswith(_MATPLATEX_HEADER):
+            continue
+        code = _comment.sub('', source)
+        graphics = _includegraphics.findall(code)
+        for jobname in _graphicnamed.findall(code):
+            figures.append(ExternalizedFigure(
+                jobname, path, path.parent / graphics[0]))
+    return figures
+
+def _walk_inputs(path: Path, base: Path, root: Path,
+                 seen: set) -> Iterator[Path]:
+    """Yield path and all files it inputs, depth first.
+
+    base is the directory \\input is relative to, and root the
+    directory of the document.
+    """
+    path = path.resolve()
+    if path in seen or not path.is_file():
+        return
+    seen.add(path)
+    yield path
+    code = _comment.sub('', path.read_text(encoding='utf-8'))
+    matches = [(m.start(), base / m[1], base) for m in _input.finditer(code)]
+    for m in _import.finditer(code):
+        directory = (base if m[1] else root) / m[2]
+        matches.append((m.start(), directory / m[3], directory))
+    for _, child, child_base in sorted(matches, key=lambda match: match[0]):
+        if not child.suffix:
+            child = child.with_suffix('.tex')
+        yield from _walk_inputs(child, child_base, root, seen)
+
+def compile_externalized(
+        document: str | Path,
+        /,
+        *,
+        command: Sequence[str] = PDFLATEX,
+        max_workers: int | None = None,
+        force: bool = False,
+        verbose: int = 1
+        ) -> BuildSummary:
+    """Compile the externalized matplatex figures of a document.
+
+    Each figure is compiled by running command with
+    --jobname=<jobname> on the document, in the directory of the
+    document, like
+        pdflatex --jobname=figure.gfx_xt document.tex
+    Several figures are compiled in parallel. A figure is skipped if its
+    tex and graphics files have not changed since it was last compiled
+    by this function and its output pdf still exists. The hashes are
+    stored in <document>.matplatex.json next to the document.
+
+    Arguments
+    ---------
+    document    The main tex file of the document.
+
+    Optional keyword arguments
+    --------------------------
+    command         The LaTeX command and its options, without the
+                    jobname and file name. Default: pdflatex in
+                    nonstop mode.
+    max_workers     The number of figures compiled at once. Defaults
+                    to the number of processors on the machine.
+    force           Compile all figures, e.g. after changing the
+                    preamble of the document, which is not hashed.
+    verbose         0: Print nothing.
+                    1: Print a summary. (default)
+                    2: Also show the output of the LaTeX command.
+    """
+    document = Path(document).resolve()
+    state_path = document.with_name(f'{document.stem}.matplatex.json')
+    state = read_json(state_path)
+    summary = BuildSummary()
+    todo = {}
+    for figure in find_externalized(document):
+        fingerprint = _fingerprint(figure, command)
+        output = document.with_name(f'{figure.jobname}.pdf')
+        if (not force and state.get(figure.jobname) == fingerprint
+                and output.exists()):
+            summary.skipped.append(figure.jobname)
+        else:
+            todo[figure.jobname] = fingerprint
+            state.pop(figure.jobname, None)
+
+    def run(jobname):
+        subprocess.run(
+            [*command, f'--jobname={jobname}', document.name],
+            cwd=document.parent,
+            check=True,
+            capture_output=(verbose < 2),
+            stdin=subprocess.DEVNULL,
+            )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {jobname: executor.submit(run, jobname) for jobname in todo}
+        for jobname, future in futures.items():
+            if (error := future.exception()) is not None:
+                summary.failed[jobname] = error
+            else:
+                summary.compiled.append(jobname)
+                state[jobname] = todo[jobname]
+    with atomic_open(state_path) as file:
+        json.dump(state, file, indent=2)
+    if verbose:
+        print(f"Compiled {len(summary.compiled)} figures, "
+              f"{len(summary.skipped)} up to date, "
+              f"{len(summary.failed)} failed")
+        for jobname, error in summary.failed.items():
+            print(f"  {jobname}: {error}")
+    return summary
+
+def _fingerprint(figure: ExternalizedFigure, command: Sequence[str]) -> str:
+    fingerprint = hashlib.sha256()
+    fingerprint.update(repr(tuple(command)).encode())
+    for path in (figure.tex, figure.graphics):
+        fingerprint.update(path.name.encode())
+        try:
+            fingerprint.update(path.read_bytes())
+        except OSError:
+            fingerprint.update(b'missing')
+    return fingerprint.hexdigest()
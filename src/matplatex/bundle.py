@@ -0,0 +1,132 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# Targets other than the file system for the files written by save.
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import io
+import os
+import tarfile
+import time
+import zipfile
+
+
+class Bundle(ABC):
+    """A collection of files written by save, e.g. an archive.
+
+    Subclasses implement open, which gives a writable file for a member
+    of the bundle. Member names are relative paths with forward
+    slashes. A bundle is a context manager which closes it on exit.
+    """
+    @abstractmethod
+    def open(self, name: str, /, *, binary: bool = False):
+        """A context manager giving a writable file for member name."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MemoryBundle(Bundle):
+    """Keep the files in memory, in the dict files, as bytes."""
+    def __init__(self):
+        self.files = {}
+
+    @contextmanager
+    def open(self, name: str, /, *, binary: bool = False):
+        buffer = io.BytesIO()
+        if binary:
+            yield buffer
+        else:
+            with _text_wrapper(buffer) as file:
+                yield file
+        self.files[name] = buffer.getvalue()
+
+
+class ZipBundle(Bundle):
+    """Write the files to a zip archive, streaming each member.
+
+    target is a file name or a binary file object, which need not be
+    seekable, e.g. a socket or an HTTP response. The archive is
+    finished when the bundle is closed.
+    """
+    def __init__(self, target, /, *, compression: int = zipfile.ZIP_DEFLATED):
+        self._zipfile = zipfile.ZipFile(target, 'w', compression=compression)
+
+    @contextmanager
+    def open(self, name: str, /, *, binary: bool = False):
+        with self._zipfile.open(name, 'w') as member:
+            if binary:
+                yield member
+            else:
+                with _text_wrapper(member) as file:
+                    yield file
+
+    def close(self):
+        self._zipfile.close()
+
+
+class TarBundle(Bundle):
+    """Write the files to a tar archive.
+
+    target is a file name or a binary file object, which need not be
+    seekable. compression is '', 'gz', 'bz2' or 'xz'. Since tar needs
+    the size of each member before its contents, each file is kept in
+    memory until it is complete, but the archive is streamed. The
+    archive is finished when the bundle is closed.
+    """
+    def __init__(self, target, /, *, compression: str = ''):
+        mode = f'w|{compression}'
+        if isinstance(target, (str, bytes)) or hasattr(target, '__fspath__'):
+            self._tarfile = tarfile.open(os.fspath(target), mode)
+        else:
+            self._tarfile = tarfile.open(fileobj=target, mode=mode)
+
+    @contextmanager
+    def open(self, name: str, /, *, binary: bool = False):
+        buffer = io.BytesIO()
+        if binary:
+            yield buffer
+        else:
+            with _text_wrapper(buffer) as file:
+                yield file
+        data = buffer.getvalue()
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tarfile.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._tarfile.close()
+
+
+@contextmanager
+def _text_wrapper(binary_file):
+    """Write text to binary_file as UTF-8, leaving it open."""
+    file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+    try:
+        yield file
+    finally:
+        file.flush()
+        file.detach()
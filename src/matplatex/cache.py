@@ -0,0 +1,173 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import matplotlib as mpl
+from matplotlib import path as mpath, transforms as mtransforms
+from matplotlib.colors import to_rgba_array
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+
+from .__about__ import __version__
+
+# Getters whose return values decide what an artist looks like. Not all
+# artists have all of them, missing ones are skipped.
+_fingerprint_getters = (
+    'get_visible',
+    'get_zorder',
+    'get_alpha',
+    'get_rasterized',
+    'get_clip_on',
+    'get_position',
+    'get_xydata',
+    'get_path',
+    'get_patch_transform',
+    'get_paths',
+    'get_offsets',
+    'get_transforms',
+    'get_array',
+    'get_extent',
+    'get_facecolor',
+    'get_edgecolor',
+    'get_color',
+    'get_linewidth',
+    'get_linestyle',
+    'get_marker',
+    'get_markersize',
+    'get_hatch',
+    'get_text',
+    'get_fontsize',
+    'get_rotation',
+    'get_xlim',
+    'get_ylim',
+    'get_xscale',
+    'get_yscale',
+    )
+_color_getters = {'get_facecolor', 'get_edgecolor', 'get_color'}
+# Floats are rounded to this many decimals before they are hashed, since
+# layout engines do not give bit-identical positions every time they run.
+_decimals = 10
+
+def figure_fingerprint(fig: Figure, /, **options) -> str:
+    """Hash the state of a figure which determines its graphics.
+
+    The hash covers the figure size and resolution, the rcParams, the
+    given save options and the data and style of every artist in the
+    figure. Artist properties not covered by _fingerprint_getters are
+    not taken into account.
+    """
+    fingerprint = hashlib.sha256()
+    update = hash_updater(fingerprint)
+    update(__version__)
+    update(sorted(options.items()))
+    _update_figure(update, fig, text=True)
+    return fingerprint.hexdigest()
+
+def graphics_fingerprint(fig: Figure, /) -> str:
+    """Hash the state of a figure which determines its graphics without
+    text.
+
+    As figure_fingerprint, except that Text only counts through what
+    it draws besides the text itself, i.e. its box and, for
+    annotations, its arrow.
+    """
+    fingerprint = hashlib.sha256()
+    _update_figure(hash_updater(fingerprint), fig, text=False)
+    return fingerprint.hexdigest()
+
+def _update_figure(update, fig: Figure, /, *, text: bool):
+    update(fig.get_size_inches())
+    update(fig.dpi)
+    update(sorted(mpl.rcParams.items()))
+    stack = [iter(fig.get_children())]
+    while stack:
+        try:
+            child = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+        if not text and isinstance(child, Text):
+            patches = [patch for patch in (child.get_bbox_patch(),
+                                           getattr(child, 'arrow_patch', None))
+                       if patch is not None]
+            if patches:
+                update(child.get_visible())
+                for patch in patches:
+                    _update_artist(update, patch)
+            continue
+        _update_artist(update, child)
+        stack.append(iter(child.get_children()))
+
+def _update_artist(update, artist, /):
+    update(type(artist).__qualname__)
+    for getter in _fingerprint_getters:
+        if hasattr(artist, getter):
+            try:
+                value = getattr(artist, getter)()
+                if getter in _color_getters:  # 'k' is the same as 'black'
+                    value = to_rgba_array(value)
+                update(value)
+            except Exception:  # Not all getters work on all artists.
+                update(None)
+
+def tex_fingerprint(latexcode: str, /) -> str:
+    """Hash the contents of a tex file."""
+    return hashlib.sha256(latexcode.encode()).hexdigest()
+
+def hash_updater(fingerprint):
+    """Make a function which adds any value to the hash.
+
+    Floats are rounded, so that values which differ only in the last
+    bits give the same hash.
+    """
+    def update(value):
+        if isinstance(value, np.ma.MaskedArray):
+            update(value.data)
+            update(np.ma.getmaskarray(value))
+        elif isinstance(value, np.ndarray):
+            if value.dtype.kind in 'fc':
+                value = np.round(value, _decimals) + 0  # + 0 turns -0. to 0.
+            fingerprint.update(f"{value.dtype}{value.shape}".encode())
+            fingerprint.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (float, np.floating)):
+            update(np.asarray(value))
+        elif isinstance(value, (list, tuple)):
+            fingerprint.update(f"{type(value).__name__}{len(value)}".encode())
+            for item in value:
+                update(item)
+        elif isinstance(value, mpath.Path):
+            update(value.vertices)
+            update(value.codes)
+        elif isinstance(value, mtransforms.Transform):
+            update(value.get_matrix())
+        elif isinstance(value, mtransforms.BboxBase):
+            update(value.get_points())
+        else:
+            string = repr(value)
+            if ' at 0x' in string:  # Address of object without a good repr.
+                string = type(value).__qualname__
+            fingerprint.update(string.encode())
+    return update
+
+def write_fingerprints(path: Path, fingerprints: dict, /):
+    path.write_text(json.dumps(fingerprints, indent=2))
@@ -0,0 +1,345 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# The matplatex command, which exports the figures of figure scripts.
+#
+# A figure script is a python file defining a dict FIGURES, which maps
+# file names to functions returning the figures, e.g.
+#     FIGURES = {'spectrum': plot_spectrum, 'fit': plot_fit}
+# It may also define a list INPUTS of the data files it reads, and a
+# dict SAVE_OPTIONS of keyword arguments for save. Relative paths are
+# taken relative to the script. A script is only run again when it or
+# one of its inputs has changed since it was last exported.
+#
+# The retex subcommand writes tex files again from the layout files of
+# save, without running the scripts or importing matplotlib.
+
+import argparse
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import runpy
+import sys
+import threading
+import traceback
+
+from .latex_input import atomic_open, read_json
+
+STATE_FILE = '.matplatex-build.json'
+
+_defines_figures = re.compile(rb'^FIGURES\s*[:=]', re.MULTILINE)
+
+
+@dataclass
+class ExportSummary:
+    """The outcome of build.
+
+    Attributes:
+    exported    Paths of the scripts whose figures were exported.
+    skipped     Paths of the scripts which were up to date.
+    failed      Dict mapping paths of the scripts which failed to the
+                exception raised when running them or saving a figure.
+    """
+    exported: list[Path] = field(default_factory=list)
+    skipped: list[Path] = field(default_factory=list)
+    failed: dict[Path, BaseException] = field(default_factory=dict)
+
+
+def find_scripts(paths: Iterable[str | Path], /) -> list[Path]:
+    """Find the figure scripts among paths.
+
+    Directories are searched recursively, skipping hidden directories.
+    Files given explicitly are always included, while files found in
+    directories are only included if they assign to FIGURES at the top
+    level.
+    """
+    scripts = []
+    for path in map(Path, paths):
+        if not path.is_dir():
+            scripts.append(path.resolve())
+            continue
+        for candidate in sorted(path.rglob('*.py')):
+            relative = candidate.relative_to(path).parts
+            if any(part.startswith('.') for part in relative):
+                continue
+            if _defines_figures.search(candidate.read_bytes()):
+                scripts.append(candidate.resolve())
+    return list(dict.fromkeys(scripts))
+
+def build(
+        paths: Iterable[str | Path],
+        /,
+        *,
+        output_dir: str | Path | None = None,
+        format: str | Sequence[str] = 'pdf',
+        force: bool = False,
+        state_file: str | Path = STATE_FILE,
+        verbose: int = 1
+        ) -> ExportSummary:
+    """Export the figures of the figure scripts which have changed.
+
+    A script is run, and each of its figures saved with save, if the
+    script or one of its INPUTS has changed since it was last exported,
+    or if one of the files it wrote is missing. The hashes are stored
+    in state_file.
+
+    Arguments
+    ---------
+    paths       Figure scripts, or directories containing them.
+
+    Optional keyword arguments
+    --------------------------
+    output_dir  Directory of the exported files. Defaults to the
+                directory of each script.
+    format      The format of the graphics, or a list of formats.
+                SAVE_OPTIONS in a script take precedence.
+    force       Export all figures, even those which are up to date.
+    state_file  Where the hashes are stored.
+    verbose     0: Print nothing.
+                1: Print a line for each script. (default)
+                2: Also print the save messages and tracebacks.
+    """
+    state_path = Path(state_file)
+    state = read_json(state_path)
+    summary = ExportSummary()
+    options = {'format': format}
+    # The figures are exported again when they are to go elsewhere.
+    fingerprint_options = options | {
+        'output_dir': str(Path(output_dir).resolve()) if output_dir else None}
+    for script in find_scripts(paths):
+        key = str(script)
+        stored = state.get(key, {})
+        fingerprint = _fingerprint(
+            script, stored.get('inputs', []), fingerprint_options)
+        if (not force and stored.get('fingerprint') == fingerprint
+                and all(map(os.path.exists, stored.get('outputs', [])))):
+            summary.skipped.append(script)
+            continue
+        state.pop(key, None)
+        try:
+            inputs, outputs = _export(script, output_dir, options, verbose)
+        except Exception as error:
+            summary.failed[script] = error
+            if verbose:
+                print(f"{script}: failed: {error!r}", file=sys.stderr)
+            if verbose == 2:
+                traceback.print_exc()
+            continue
+        state[key] = {
+            'fingerprint': _fingerprint(script, inputs, fingerprint_options),
+            'inputs': inputs,
+            'outputs': outputs,
+            }
+        summary.exported.append(script)
+        if verbose:
+            print(f"{script}: exported {len(outputs)} files")
+    with atomic_open(state_path) as file:
+        json.dump(state, file, indent=2)
+    return summary
+
+def watch(
+        paths: Sequence[str | Path],
+        /,
+        *,
+        interval: float = 0.2,
+        stop: threading.Event | None = None,
+        **options
+        ):
+    """Export the figures of the figure scripts whenever they change.
+
+    Runs build once, then polls the modification times of the scripts
+    and their inputs every interval seconds, and builds again when one
+    has changed or a script has been added. Everything runs in this
+    process, so matplotlib is only imported once. Runs until stop is set
+    or the process is interrupted. The keyword arguments are passed to
+    build.
+    """
+    stop = stop or threading.Event()
+    state_path = Path(options.get('state_file', STATE_FILE))
+    signature = None
+    while True:
+        new_signature = _signature(paths, state_path)
+        if new_signature != signature:
+            build(paths, **options)
+            signature = _signature(paths, state_path)
+        if stop.wait(interval):
+            return
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='matplatex',
+        description="Export the figures of figure scripts with matplatex.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser(
+        'build', help="Export the figures of the changed scripts.")
+    watch_parser = subparsers.add_parser(
+        'watch', help="Export the figures of the scripts whenever they "
+                      "change.")
+    for subparser in build_parser, watch_parser:
+        subparser.add_argument(
+            'paths', nargs='*', default=['.'],
+            help="Figure scripts, or directories to search for scripts "
+                 "defining FIGURES. Default: the current directory.")
+        subparser.add_argument(
+            '-o', '--output-dir',
+            help="Directory of the exported files. Default: the directory "
+                 "of each script.")
+        subparser.add_argument(
+            '-f', '--format', action='append',
+            help="Graphics format, can be given several times. "
+                 "Default: pdf.")
+        subparser.add_argument(
+            '--state-file', default=STATE_FILE,
+            help=f"Where to store the hashes. Default: {STATE_FILE}.")
+        subparser.add_argument(
+            '-v', '--verbose', action='count', default=1,
+            help="Also print the save messages and tracebacks.")
+        subparser.add_argument(
+            '-q', '--quiet', action='store_const', const=0, dest='verbose',
+            help="Print nothing.")
+    build_parser.add_argument(
+        '--force', action='store_true',
+        help="Export all figures, even those which are up to date.")
+    watch_parser.add_argument(
+        '--interval', type=float, default=0.2,
+        help="Seconds between checks for changes. Default: 0.2.")
+    retex_parser = subparsers.add_parser(
+        'retex', help="Write tex files again from layout files, without "
+                      "the figures.")
+    retex_parser.add_argument(
+        'layouts', nargs='+',
+        help="<name>.layout.json files written by save with layout=True.")
+    retex_parser.add_argument(
+        '--widthcommand', default=r'\figurewidth',
+        help="The LaTeX length command for the figure width. "
+             "Default: \\figurewidth.")
+    retex_parser.add_argument(
+        '--scale-fontsize', type=float, nargs='?', const=1.0, default=False,
+        help="Map the font sizes to LaTeX size commands, after scaling "
+             "them by the given factor.")
+    retex_parser.add_argument(
+        '--externalize', action='store_true',
+        help="Write the code for manual tikz externalization.")
+    retex_parser.add_argument(
+        '--trim', action='store_true',
+        help="Trim the bounding box to the figure size.")
+    retex_parser.add_argument(
+        '--compact', action='store_true',
+        help="Define each text style once, for smaller tex files.")
+    retex_parser.add_argument(
+        '--precision', type=int, default=4,
+        help="Number of decimals in the text coordinates. Default: 4.")
+    retex_parser.add_argument(
+        '--emitter', choices=['tikz', 'pgf'], default='tikz',
+        help="Write tikz nodes or basic-layer PGF. Default: tikz.")
+    retex_parser.add_argument(
+        '-q', '--quiet', action='store_const', const=0, default=1,
+        dest='verbose', help="Print nothing.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'retex':
+        from .sidecar import retex
+        for layout_file in args.layouts:
+            retex(layout_file,
+                  widthcommand=args.widthcommand,
+                  scale_fontsize=args.scale_fontsize,
+                  externalize=args.externalize,
+                  trim=args.trim,
+                  compact=args.compact,
+                  precision=args.precision,
+                  emitter=args.emitter,
+                  verbose=args.verbose)
+        return 0
+
+    # Figures are only saved, never shown.
+    os.environ.setdefault('MPLBACKEND', 'agg')
+    options = dict(
+        output_dir=args.output_dir,
+        format=args.format or 'pdf',
+        state_file=args.state_file,
+        verbose=min(args.verbose, 2),
+        )
+    if args.command == 'build':
+        summary = build(args.paths, force=args.force, **options)
+        return 1 if summary.failed else 0
+    try:
+        watch(args.paths, interval=args.interval, **options)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def _export(script: Path, output_dir, options: dict, verbose: int):
+    """Run a figure script and save its figures.
+
+    Returns the paths of the inputs and of the files written.
+    """
+    from .ui import _as_formats, _save_job
+
+    sys.path.insert(0, str(script.parent))  # For imports next to the script.
+    try:
+        namespace = runpy.run_path(str(script), run_name='__matplatex__')
+    finally:
+        sys.path.remove(str(script.parent))
+    try:
+        figures = namespace['FIGURES']
+    except KeyError:
+        raise ValueError(f"{script.name} does not define FIGURES") from None
+    inputs = [str(script.parent / path) for path in namespace.get('INPUTS', [])]
+    save_options = options | namespace.get('SAVE_OPTIONS', {})
+    save_options['verbose'] = int(verbose == 2)
+    directory = Path(output_dir) if output_dir else script.parent
+    directory.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    for name, factory in figures.items():
+        filepath = directory / name
+        _save_job(factory, filepath, save_options)
+        outputs.append(str(filepath.with_name(f'{filepath.name}.tex')))
+        outputs.extend(
+            str(filepath.with_name(f'{filepath.name}.gfx.{fmt}'))
+            for fmt in _as_formats(save_options['format']))
+    return inputs, outputs
+
+def _fingerprint(script: Path, inputs: list[str], options: dict) -> str:
+    fingerprint = hashlib.sha256()
+    fingerprint.update(repr(sorted(options.items())).encode())
+    for path in [script, *map(Path, inputs)]:
+        fingerprint.update(str(path).encode())
+        try:
+            fingerprint.update(path.read_bytes())
+        except OSError:
+            fingerprint.update(b'missing')
+    return fingerprint.hexdigest()
+
+def _signature(paths, state_path: Path) -> list:
+    """Modification times and sizes of the scripts and their inputs."""
+    state = read_json(state_path)
+    files = find_scripts(paths)
+    for script in list(files):
+        files.extend(map(Path, state.get(str(script), {}).get('inputs', [])))
+    signature = []
+    for path in files:
+        try:
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+    return signature
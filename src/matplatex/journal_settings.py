@@ -20,11 +20,16 @@ class PRC:
 class Beamer:
     full_width = 128 * _inches_per_mm
     widescreen = 160 * _inches_per_mm
+    # Paper width in mm for each aspect ratio. See Beamer documentation 8.3.
+    _widths = {1610: 160, 169: 160, 149: 140, 141: 148.5, 54: 125, 43: 128,
+               32: 135}
 
+    @staticmethod
     def width(aspectratio: int):
         """Beamer width given aspect ratio. See Beamer documentation 8.3."""
-        s = str(aspectratio)
-        middle = len(s)//2          # splitting here makes the second slice
-        w = s[::-1][middle:][::-1]  # longer in case of odd length. I want
-        h = s[::-1][:middle][::-1]  # the first to be longer, so I reverse s.
-        return 96 * _inches_per_mm / h * w
+        try:
+            return Beamer._widths[aspectratio] * _inches_per_mm
+        except KeyError:
+            raise ValueError(
+                f"Unknown beamer aspect ratio {aspectratio}, expected one "
+                f"of {', '.join(map(str, Beamer._widths))}") from None
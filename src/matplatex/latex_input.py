@@ -17,7 +17,11 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+from contextlib import contextmanager
+import json
+import os
 from pathlib import Path
+import secrets
 import sys
 
 from .__about__ import __version__
@@ -27,11 +31,15 @@ class LaTeXinput:
     """Text to be input into a LaTeX document to include a figure.
 
     Instance variables:
-    latexcode       The text in question as a string.
+    latexcode       The text in question as a string. Not available
+                    when streaming to a sink.
     graphic_isopen   Tracks whether a figure environment is currently
                     open in latexcode.
     widthcommand    The LaTeX length command which will be used to
                     define the width of the figure.
+    compact         Whether to define node styles once and leave out
+                    default values.
+    precision       Number of decimals in the text coordinates.
 
     Public methods:
     __init__            Constructor.
@@ -40,29 +48,53 @@ class LaTeXinput:
     endgraphics         Close a figure environment.
     addline             Add a single line of code to latexcode.
     write               Write latexcode to a file.
+    write_to            Write latexcode to an open file object.
+    close               Close any open figure environment.
     """
 
     # only works for single characters
     # translatex = str.maketrans(invalid_latex)
 
-    def __init__(self, *, widthcommand: str, externalize: bool, trim: bool):
+    _package = 'tikz'
+
+    def __init__(
+            self, *, widthcommand: str, externalize: bool, trim: bool,
+            compact: bool = False, precision: int = 4, sink=None
+            ):
         """Constructor for the LaTeXinput class.
 
         Keyword only arguments:
         widthcommand    The LaTeX length command which will be used to
                         define the width of the figure.
         externalize     Whether to use tikz externalize
+        trim            Trim the bounding box to the figure size.
+        compact         Define each distinct combination of colour,
+                        opacity, anchor and rotation once as a tikz
+                        style, and leave out default values. This makes
+                        the code much shorter for figures with many
+                        labels.
+        precision       Number of decimals in the text coordinates.
+        sink            Any object with a write method taking a string,
+                        e.g. a file opened with atomic_open. If given,
+                        the code is written to it as it is added,
+                        instead of being kept in latexcode.
         """
         self.graphic_isopen = False
         self.widthcommand = as_latex_command(widthcommand)
         self.externalize = externalize
         self.trim = trim
+        self.compact = compact
+        self.precision = precision
+        self._styles = {}
+        self._colors = {}
+        self._sink = sink
+        self._chunks = []
 
-        self.latexcode = '\n'.join([
+        self._emit('\n'.join([
             f"% This file was automatically generated by matpLaTeX {__version__}.",
             "% The source code is at https://github.com/johashei/matplatex.",
             "%",
-            "% Requires package tikz.",
+            f"% Requires package {self._package}.",
             "%",
             "% Usage:",
             "%",
@@ -79,7 +111,21 @@ class LaTeXinput:
             rf"%   \import{{<path>}}{{<file name>.tex}}",
             "%",
             "%"
-            ])
+            ]))
+
+    @property
+    def latexcode(self) -> str:
+        if self._sink is not None:
+            raise AttributeError("latexcode is not kept when using a sink")
+        if len(self._chunks) != 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0]
+
+    @latexcode.setter
+    def latexcode(self, value: str):
+        if self._sink is not None:
+            raise AttributeError("latexcode is not kept when using a sink")
+        self._chunks = [value]
 
     def includegraphics(self, graphics_filename: Path, height_to_width: float):
         """ Start a tikzpicture and include the graphics."""
@@ -93,7 +139,9 @@ class LaTeXinput:
             tikz_trim = r", trim left, trim right=\figurewidth"
         else:
             minipage = tikz_trim = ""
-        self.latexcode += '\n'.join([
+        if self.compact:
+            tikz_trim += r", every node/.style={inner sep=0pt}"
+        self._emit('\n'.join([
             r"\begingroup",
             "",
             rf"\setlength{{\matplatextmp}}{{{height_to_width:.4f}{self.widthcommand}}}%",
@@ -101,7 +149,7 @@ class LaTeXinput:
             rf"\begin{{tikzpicture}}[x={self.widthcommand}, y=\matplatextmp{tikz_trim}]",
             r"  \node[inner sep=0pt, above right] (graphics) at (0,0) {",
             rf"    \includegraphics[width={self.widthcommand}]{{{graphics_filename}}}}};",
-            ])
+            ]))
         self.graphic_isopen = True
 
     def add_text(
@@ -113,23 +161,77 @@ class LaTeXinput:
             color=(0, 0, 0),
             alpha=1,
             anchor='center',
-            sizecmd=''
+            sizecmd='',
+            overlay=None
             ):
+        """Draw a text box.
+
+        If overlay is given, e.g. '\\only<2-3>', the node is only shown
+        on those beamer overlays.
+        """
         if len(color)==4:
             alpha = color[3]
         if sizecmd:
             cmddelim = ' '
         else:
             cmddelim = ''
-        self.addline(rf"  \node [inner sep=0pt, "
-                                 rf"text={{rgb,1:red,{color[0]:.3f}; "
-                                           rf"green,{color[1]:.3f}; "
-                                           rf"blue,{color[2]:.3f}}}, "
-                     rf"rotate={rotation}, "
-                     rf"anchor={anchor}, "
-                     rf"opacity={alpha}] "
-                     rf"at ({position[0]:.4f}, {position[1]:.4f}) "
-                     rf"{{{sizecmd}{cmddelim}{text}}};")
+        x, y = (self._format_coordinate(value) for value in position)
+        if self.compact:
+            style = self._node_style(color[:3], alpha, anchor, rotation)
+            node = (rf"\node{style} at ({x},{y}) "
+                    rf"{{{sizecmd}{cmddelim}{text}}};")
+        else:
+            node = (rf"\node [inner sep=0pt, "
+                            rf"text={{rgb,1:red,{color[0]:.3f}; "
+                                      rf"green,{color[1]:.3f}; "
+                                      rf"blue,{color[2]:.3f}}}, "
+                    rf"rotate={rotation}, "
+                    rf"anchor={anchor}, "
+                    rf"opacity={alpha}] "
+                    rf"at ({x}, {y}) "
+                    rf"{{{sizecmd}{cmddelim}{text}}};")
+        if overlay:
+            node = f"{overlay}{{{node}}}"
+        self.addline(f"  {node}")
+
+    def _node_style(self, color, alpha, anchor, rotation) -> str:
+        """Node options using a shared style, defined on first use.
+
+        Default values are left out, and if all values are default no
+        style is used.
+        """
+        rgb = ','.join(f"{value:.3f}" for value in color)
+        key = (rgb, alpha, anchor.strip(), rotation)
+        if key not in self._styles:
+            options = []
+            if any(color):  # not black
+                if rgb not in self._colors:
+                    self._colors[rgb] = f"mpltc{len(self._colors)}"
+                    self.addline(
+                        rf"  \definecolor{{{self._colors[rgb]}}}{{rgb}}{{{rgb}}}")
+                options.append(f"text={self._colors[rgb]}")
+            if rotation:
+                options.append(f"rotate={rotation:g}")
+            if anchor.strip() != 'center':
+                options.append(f"anchor={anchor.strip()}")
+            if alpha != 1:
+                options.append(f"opacity={alpha:g}")
+            if options:
+                name = f"mplt{len(self._styles)}"
+                self.addline(
+                    rf"  \tikzset{{{name}/.style={{{', '.join(options)}}}}}")
+                self._styles[key] = f"[{name}]"
+            else:
+                self._styles[key] = ""
+        return self._styles[key]
+
+    def _format_coordinate(self, value: float) -> str:
+        string = f"{value:.{self.precision}f}"
+        if self.compact and '.' in string:
+            string = string.rstrip('0').rstrip('.')
+            if string in ('', '-', '-0'):
+                string = '0'
+        return string
 
     def endgraphics(self):
         self.addline(r"\end{tikzpicture}")
@@ -141,13 +243,184 @@ class LaTeXinput:
         self.graphic_isopen = False
 
     def addline(self, text):
-        self.latexcode += f"\n{text}"
+        self._emit(f"\n{text}")
 
     def write(self, filename):
+        """Write latexcode to a file, replacing it atomically."""
+        with atomic_open(filename) as outfile:
+            self.write_to(outfile)
+
+    def write_to(self, file):
+        """Write latexcode to a file object opened for text."""
+        if self._sink is not None:
+            raise ValueError("The code has already been written to the sink")
+        self.close()
+        file.writelines(self._chunks)
+
+    def close(self):
+        if self.graphic_isopen:
+            self.endgraphics()
+
+    def _emit(self, text: str):
+        if self._sink is None:
+            self._chunks.append(text)
+        else:
+            self._sink.write(text)
+
+
+class PGFinput(LaTeXinput):
+    """Like LaTeXinput, but draws the text with the basic layer of PGF.
+
+    Each text is placed with \\pgftext instead of a tikz node, which
+    takes much less key parsing, so documents with many labels compile
+    faster. The layout and the meaning of widthcommand, externalize and
+    trim are the same. compact defines each colour once and a short
+    command for the positions, local to the figure. pgftext has no
+    'mid' anchor, which tikz puts half an ex above the baseline, so
+    such text is placed at its baseline and lowered by half an ex of
+    the surrounding font, as tikz does.
+    """
+
+    _package = 'pgf'
+    # \pgftext options for each tikz anchor.
+    _anchors = {
+        'north': 'top', 'south': 'bottom', 'base': 'base', 'mid': 'base',
+        'west': 'left', 'east': 'right', 'center': ''}
+
+    def includegraphics(self, graphics_filename: Path, height_to_width: float):
+        """Start a pgfpicture and include the graphics."""
         if self.graphic_isopen:
             self.endgraphics()
-        with open(filename, 'w') as outfile:
-            outfile.write(self.latexcode)
+        self.addline('')
+        if self.externalize:
+            self.addline(rf"\beginpgfgraphicnamed{{{graphics_filename.stem}_xt}}")
+        if self.trim:
+            minipage = ('\n'rf"\begin{{minipage}}[b][\matplatextmp]"
+                        rf"{{{self.widthcommand}}}")
+        else:
+            minipage = ""
+        self._emit('\n'.join([
+            r"\begingroup",
+            "",
+            rf"\setlength{{\matplatextmp}}{{{height_to_width:.4f}{self.widthcommand}}}%",
+            rf"\hspace{{-\parindent}}%{minipage}",
+            r"\begin{pgfpicture}",
+            r"  \pgftext[left,bottom,at={\pgfpointorigin}]{%",
+            rf"    \includegraphics[width={self.widthcommand}]{{{graphics_filename}}}}}",
+            ]))
+        if self.compact:
+            self.addline(rf"  \def\mpltp#1#2{{\pgfpoint{{#1{self.widthcommand}}}"
+                         r"{#2\matplatextmp}}")
+        self.graphic_isopen = True
+
+    def add_text(
+            self,
+            text,
+            position,
+            *,
+            rotation=0,
+            color=(0, 0, 0),
+            alpha=1,
+            anchor='center',
+            sizecmd='',
+            overlay=None
+            ):
+        """Draw a text box.
+
+        If overlay is given, e.g. '\\only<2-3>', the text is only shown
+        on those beamer overlays.
+        """
+        if len(color)==4:
+            alpha = color[3]
+        if sizecmd:
+            cmddelim = ' '
+        else:
+            cmddelim = ''
+        x, y = (self._format_coordinate(value) for value in position)
+        if self.compact:
+            options = [rf"at={{\mpltp{{{x}}}{{{y}}}}}"]
+        else:
+            options = [rf"at={{\pgfpoint{{{x}{self.widthcommand}}}"
+                       rf"{{{y}\matplatextmp}}}}"]
+        options.extend(filter(None, map(self._anchors.get, anchor.split())))
+        if rotation:
+            options.append(f"rotate={rotation:g}")
+        content = f"{self._color_command(color[:3])}{sizecmd}{cmddelim}{text}"
+        if 'mid' in anchor.split():
+            content = rf"\raisebox{{-.5ex}}{{{content}}}"
+        node = rf"\pgftext[{','.join(options)}]{{{content}}}"
+        if alpha != 1:
+            node = (rf"\begin{{pgfscope}}\pgfsetfillopacity{{{alpha:g}}}"
+                    rf"{node}\end{{pgfscope}}")
+        if overlay:
+            node = f"{overlay}{{{node}}}"
+        self.addline(f"  {node}")
+
+    def _color_command(self, color) -> str:
+        """The command setting the text colour, empty for black."""
+        if not any(color):
+            return ''
+        rgb = ','.join(f"{value:.3f}" for value in color)
+        if not self.compact:
+            return rf"\color[rgb]{{{rgb}}}"
+        if rgb not in self._colors:
+            self._colors[rgb] = f"mpltc{len(self._colors)}"
+            self.addline(
+                rf"  \definecolor{{{self._colors[rgb]}}}{{rgb}}{{{rgb}}}")
+        return rf"\color{{{self._colors[rgb]}}}"
+
+    def endgraphics(self):
+        if self.trim:
+            self.addline(r"  \pgfresetboundingbox")
+            self.addline(rf"  \pgfpathrectangle{{\pgfpointorigin}}"
+                         rf"{{\pgfpoint{{{self.widthcommand}}}{{\matplatextmp}}}}")
+            self.addline(r"  \pgfusepath{use as bounding box}")
+        self.addline(r"\end{pgfpicture}")
+        if self.trim:
+            self.addline(r"\end{minipage}")
+        self.addline(r"\endgroup")
+        if self.externalize:
+            self.addline(r"\endpgfgraphicnamed")
+        self.graphic_isopen = False
+
+
+# The classes writing each kind of LaTeX code, by the name given to save.
+EMITTERS = {'tikz': LaTeXinput, 'pgf': PGFinput}
+
+def get_emitter(name: str, /) -> type[LaTeXinput]:
+    """The class writing the tex code for the emitter option of save."""
+    try:
+        return EMITTERS[name]
+    except KeyError:
+        raise ValueError(f"emitter must be one of {', '.join(EMITTERS)}, "
+                         f"not {name!r}") from None
+
+
+@contextmanager
+def atomic_open(filename, *, binary: bool = False, **kwargs):
+    """Open a temporary file which replaces filename when closed.
+
+    The file is written next to filename, and only moved into place if
+    the with block exits without an exception, so that nobody reading
+    filename ever sees a half-written file. Keyword arguments are
+    passed on to open.
+    """
+    path = Path(filename)
+    temporary = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+    try:
+        with open(temporary, 'xb' if binary else 'x', **kwargs) as file:
+            yield file
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+def read_json(path: Path, /) -> dict:
+    """Read a JSON state file. Returns an empty dict if there is none."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
 
 
 def as_latex_command(string: str, /):
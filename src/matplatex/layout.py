@@ -0,0 +1,143 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# The text layout of a figure, independent of matplotlib.
+
+from collections import Counter
+from dataclasses import dataclass
+
+from .latex_input import LaTeXinput
+from .sanitize import compile_table, get_sanitizer
+from .settings import fontsize_map
+
+
+@dataclass(frozen=True, slots=True)
+class TextRecord:
+    """A text element extracted from a figure.
+
+    Attributes:
+    text        The text as given to matplotlib.
+    x, y        Position of the anchor in figure coordinates.
+    anchor      The tikz anchor, e.g. 'north west'.
+    rotation    Rotation in degrees.
+    color       RGBA tuple.
+    fontsize    Font size in points.
+    usetex      Whether matplotlib would render the text with LaTeX.
+    """
+    text: str
+    x: float
+    y: float
+    anchor: str
+    rotation: float
+    color: tuple[float, float, float, float]
+    fontsize: float
+    usetex: bool
+
+
+def write_records(
+        output: LaTeXinput,
+        records,
+        *,
+        scale_fontsize: float | bool = False,
+        replacements: dict[str, str] | None = None
+        ):
+    """Add text records to an open graphic in output.
+
+    The replacements are used in addition to the default ones when
+    translating the text to LaTeX.
+    """
+    write = _record_writer(output, scale_fontsize, replacements)
+    for record in records:
+        write(record)
+
+def write_frames(
+        output: LaTeXinput,
+        frames,
+        *,
+        command: str = r'\only',
+        scale_fontsize: float | bool = False,
+        replacements: dict[str, str] | None = None
+        ):
+    """Add the text records of several beamer overlays to an open
+    graphic in output.
+
+    frames is a sequence with a sequence of records for each overlay.
+    Records found on every overlay are written once, and the others are
+    wrapped in the overlay command, e.g. \\only<2,4-5>{...}. A record
+    found several times on an overlay is written as many times, each
+    copy shown on the overlays which have at least that many.
+    """
+    overlays = {}
+    for number, records in enumerate(frames, start=1):
+        copies = Counter()
+        for record in records:
+            copies[record] += 1
+            overlays.setdefault((record, copies[record]), []).append(number)
+    write = _record_writer(output, scale_fontsize, replacements)
+    for (record, _), numbers in overlays.items():
+        if len(numbers) == len(frames):
+            write(record)
+        else:
+            specification = overlay_specification(numbers)
+            write(record, overlay=f"{command}<{specification}>")
+
+def overlay_specification(numbers: list[int], /) -> str:
+    """Beamer overlay specification for increasing numbers, e.g.
+    [1, 2, 3, 5] gives '1-3,5'."""
+    ranges = []
+    for number in numbers:
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ','.join(str(first) if first == last else f"{first}-{last}"
+                    for first, last in ranges)
+
+def _record_writer(output, scale_fontsize, replacements):
+    """A function adding one record to output."""
+    math_mode = get_sanitizer('math', replacements)
+    text_mode = get_sanitizer('text', replacements)
+    def write(record: TextRecord, overlay: str | None = None):
+        if scale_fontsize:
+            sizecmd = get_fontsize(record.fontsize, scale=scale_fontsize)
+        else:
+            sizecmd = ''
+        if record.usetex:
+            text = math_mode(record.text)
+        else:
+            text = text_mode(record.text)
+        output.add_text(
+            text,
+            position=(record.x, record.y),
+            anchor=record.anchor,
+            rotation=record.rotation,
+            color=record.color,
+            sizecmd=sizecmd,
+            overlay=overlay
+            )
+    return write
+
+def get_fontsize(fontsize: float, scale=1.0) -> str:
+    """The LaTeX size command matching a font size in points."""
+    for latex_size, maxsize in fontsize_map.items():
+        if scale*fontsize <= maxsize:
+            return latex_size
+
+def replace_multiple(string: str, replacements: dict) -> str:
+    """Replace the keys of replacements by their values in string."""
+    return compile_table(replacements)(string)
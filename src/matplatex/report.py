@@ -0,0 +1,74 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# Structured information about a save, for build monitoring.
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import time
+
+
+@dataclass(slots=True)
+class SaveReport:
+    """What happened during a call to save.
+
+    Attributes:
+    filename    The filename given to save, without extension.
+    format      The format of the graphics file, or the list of formats.
+    times       Wall time in seconds of each phase, in the order they
+                ran. The text is extracted while the figure is drawn,
+                so 'extract' is part of 'savefig' (or of 'fingerprint'
+                when the cache is used). Without the cache, the tex code
+                is written as it is made, so 'write_tex' is part of
+                'write'. 'total' is the whole save.
+    counts      Number of text elements that were 'kept', and of those
+                removed because they were 'invisible', 'empty' or
+                'transparent'.
+    sizes       Size in bytes of the 'tex' file, of each graphics file as
+                'graphics.<format>', and of all graphics files together
+                as 'graphics'.
+    written     The files that were written, which with cache=True
+                may be fewer than all.
+    """
+    filename: str
+    format: str | list[str]
+    times: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    sizes: dict[str, int] = field(default_factory=dict)
+    written: list[str] = field(default_factory=list)
+
+    @contextmanager
+    def time(self, phase: str, /):
+        """Add the wall time of the with block to the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[phase] = (self.times.get(phase, 0.0)
+                                 + time.perf_counter() - start)
+
+    def as_dict(self) -> dict:
+        """The report as a JSON serialisable dict."""
+        return {
+            'filename': self.filename,
+            'format': self.format,
+            'times': dict(self.times),
+            'counts': dict(self.counts),
+            'sizes': dict(self.sizes),
+            'written': list(self.written),
+            }
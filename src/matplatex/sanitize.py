@@ -0,0 +1,88 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# Translate matplotlib text to LaTeX in a single pass.
+
+from collections.abc import Mapping
+from functools import lru_cache
+import re
+
+from .settings import Replacements
+
+CACHE_SIZE = 4096
+
+
+class Sanitizer:
+    """Replace every key of a table by its value, in a single pass.
+
+    The table is compiled once, into a str.translate table if all keys
+    are single characters, and otherwise into one regular expression
+    where longer keys take precedence. Replaced text is never replaced
+    again, unlike with repeated calls to str.replace. The results for
+    the last CACHE_SIZE distinct strings are cached, since e.g. tick
+    labels repeat across axes.
+
+    Get instances with get_sanitizer or compile_table, which reuse them.
+    """
+    def __init__(self, replacements: Mapping[str, str], /):
+        self.replacements = {
+            key: value for key, value in replacements.items() if key}
+        if all(len(key) == 1 for key in self.replacements):
+            translate = _translator(str.maketrans(self.replacements))
+        else:
+            translate = _substituter(self.replacements)
+        self._translate = lru_cache(maxsize=CACHE_SIZE)(translate)
+
+    def __call__(self, string: str, /) -> str:
+        if not self.replacements:
+            return string
+        return self._translate(string)
+
+def _translator(table: dict, /):
+    def translate(string: str) -> str:
+        return string.translate(table)
+    return translate
+
+def _substituter(replacements: dict, /):
+    keys = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile('|'.join(map(re.escape, keys)))
+    def replace(match: re.Match) -> str:
+        return replacements[match[0]]
+    def translate(string: str) -> str:
+        return pattern.sub(replace, string)
+    return translate
+
+def get_sanitizer(
+        mode: str, /, extra: Mapping[str, str] | None = None) -> Sanitizer:
+    """The sanitizer for text in 'math' or 'text' mode.
+
+    The replacements in extra are added to those of the mode in
+    Replacements, and take precedence over them.
+    """
+    table = getattr(Replacements, f'{mode}_mode')
+    if extra:
+        table = table | dict(extra)
+    return compile_table(table)
+
+def compile_table(replacements: Mapping[str, str], /) -> Sanitizer:
+    """The Sanitizer for a replacement table, reused for equal tables."""
+    return _compile(tuple(replacements.items()))
+
+@lru_cache(maxsize=64)
+def _compile(items: tuple, /) -> Sanitizer:
+    return Sanitizer(dict(items))
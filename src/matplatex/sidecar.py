@@ -0,0 +1,142 @@
+"""matplatex: export matplotlib figures as image and text separately for
+use in LaTeX.
+
+Copyright (C) 2024–2026 Johannes Sørby Heines
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+# The layout sidecar file, from which the tex file can be written again
+# without the figure. Nothing here imports matplotlib.
+#
+# The file is JSON with the graphics file name relative to the tex file,
+# the height to width ratio of the figure and one list per text record,
+# with the values in the order of the TextRecord fields.
+
+from dataclasses import astuple, dataclass, fields
+import json
+import os
+from pathlib import Path
+
+from .latex_input import get_emitter
+from .layout import TextRecord, write_records
+
+FORMAT_VERSION = 1
+
+_fields = [field.name for field in fields(TextRecord)]
+
+
+@dataclass(frozen=True, slots=True)
+class FigureLayout:
+    """Everything about a figure needed to write its tex file.
+
+    Attributes:
+    graphics        Path of the graphics file, relative to the tex file.
+    height_to_width Height to width ratio of the figure.
+    records         The text records, in the order they are written.
+    """
+    graphics: str
+    height_to_width: float
+    records: tuple[TextRecord, ...]
+
+
+def layout_path(filename: str | Path, /) -> Path:
+    """The sidecar file of the files saved as filename."""
+    filepath = Path(filename)
+    return filepath.with_name(f'{filepath.name}.layout.json')
+
+def dumps_layout(layout: FigureLayout, /) -> str:
+    """The contents of the sidecar file of a layout."""
+    return json.dumps({
+        'version': FORMAT_VERSION,
+        'graphics': layout.graphics,
+        'height_to_width': layout.height_to_width,
+        'fields': _fields,
+        'records': [astuple(record) for record in layout.records],
+        }, separators=(',', ':'), default=_to_builtin)
+
+def read_layout(path: str | Path, /) -> FigureLayout:
+    """Read a sidecar file written by save with layout=True."""
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has layout version {data.get('version')}, "
+            f"expected {FORMAT_VERSION}")
+    order = [data['fields'].index(name) for name in _fields]
+    records = []
+    for values in data['records']:
+        record = dict(zip(_fields, (values[i] for i in order)))
+        record['color'] = tuple(record['color'])
+        records.append(TextRecord(**record))
+    return FigureLayout(
+        data['graphics'], data['height_to_width'], tuple(records))
+
+def retex(
+        layout_file: str | Path,
+        filename: str | Path | None = None,
+        *,
+        widthcommand: str = r"\figurewidth",
+        scale_fontsize: float | bool = False,
+        externalize: bool = False,
+        trim: bool = False,
+        compact: bool = False,
+        precision: int = 4,
+        replacements: dict[str, str] | None = None,
+        emitter: str = 'tikz',
+        verbose: int = 1
+        ) -> Path:
+    """Write the tex file of a figure again from its sidecar file.
+
+    Gives the same tex file as save with the same options, without the
+    figure and without importing matplotlib. Returns the path of the
+    tex file.
+
+    Arguments
+    ---------
+    layout_file The <filename>.layout.json file written by save with
+                layout=True.
+    filename    The name of the tex file, without extension. Defaults to
+                the name the figure was saved with. The graphics are
+                included relative to this file.
+
+    Optional keyword arguments
+    --------------------------
+    As for save.
+    """
+    layout_file = Path(layout_file)
+    if filename is None:
+        filename = layout_file.with_name(
+            layout_file.name.removesuffix('.layout.json'))
+    filepath = Path(filename)
+    latex_path = filepath.with_name(f'{filepath.name}.tex')
+    layout = read_layout(layout_file)
+    graphics = Path(os.path.relpath(
+        layout_file.parent / layout.graphics, latex_path.parent))
+    output = get_emitter(emitter)(
+        widthcommand=widthcommand,
+        externalize=externalize,
+        trim=trim,
+        compact=compact,
+        precision=precision
+        )
+    output.includegraphics(graphics, layout.height_to_width)
+    write_records(output, layout.records, scale_fontsize=scale_fontsize,
+                  replacements=replacements)
+    output.write(latex_path)
+    if verbose:
+        print(f"Figure written to file {latex_path}")
+    return latex_path
+
+def _to_builtin(value):
+    """Convert numpy scalars, which json can not write."""
+    return value.item()
@@ -17,49 +17,60 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 from functools import cached_property, partial
+import io
+import pickle
 import sys
-
-import matplotlib.pyplot as plt
+import threading
+import weakref
+
+import numpy as np
+from matplotlib.artist import Artist
+from matplotlib.axes import Axes
+from matplotlib.axis import Axis
+from matplotlib.collections import Collection, QuadMesh
+from matplotlib.figure import Figure
+from matplotlib.layout_engine import PlaceHolderLayoutEngine
+from matplotlib.lines import Line2D
 from matplotlib.colors import to_rgba
+from matplotlib.text import Text
 from beartype import beartype
 
 from .latex_input import LaTeXinput
-from .settings import fontsize_map, Replacements
+from .layout import TextRecord, write_records
+from .layout import get_fontsize as latex_fontsize
+from .report import SaveReport
+# Unused here, but kept importable from tools, where code written
+# against earlier versions looks for them.
+from .layout import replace_multiple  # noqa: F401
+from .settings import fontsize_map  # noqa: F401
+
+MAX_RASTER_DPI = 300
+MAX_RASTER_PIXELS = 4000
 
 def write_tex(
         output: LaTeXinput, fig, *,
-        graphics, scale_fontsize=False, add_anchors=False, verbose=False
+        graphics, text=None, scale_fontsize=False, add_anchors=False,
+        verbose=False, replacements=None
         ):
     output.includegraphics(graphics, get_height_to_width(fig))
-    for element in extract_text(fig, verbose):
-        if add_anchors:  # useful for checking positioning
-            draw_anchors(fig, element.position_in_figure)
-        if scale_fontsize:
-            sizecmd = element.get_fontsize(scale=scale_fontsize)
-        else:
-            sizecmd = ''
-        if element.usetex:
-            text = replace_multiple(element.text, Replacements.math_mode)
-        else:
-            text = replace_multiple(element.text, Replacements.text_mode)
-        output.add_text(
-            text,
-            position=element.position_in_figure,
-            anchor=element.tikz_anchor,
-            rotation=element.rotation,
-            color=element.color,
-            sizecmd=sizecmd
-            )
+    if text is None:
+        text = extract_records(fig, verbose)
+    if add_anchors:  # useful for checking positioning
+        for record in text:
+            draw_anchors(fig, (record.x, record.y))
+    write_records(output, text, scale_fontsize=scale_fontsize,
+                  replacements=replacements)
 
 class FigureText:
     """Contain text and its tikz properties."""
     def __init__(
             self,
-            text: plt.Text,
-            fig: plt.Figure,
-            ax: plt.Axes | None):
+            text: Text,
+            fig: Figure,
+            ax: Axes | None):
         """Constructor for the FigureText class."""
         self.mpl_text = text
         self._figure_transform = fig.transFigure
@@ -94,23 +105,7 @@ class FigureText:
 
     @cached_property
     def tikz_anchor(self) -> str:
-        anchor_by_va = {
-            'bottom': 'south',
-            'top': 'north',
-            'center': '',
-            'baseline': 'base',
-            'center_baseline': 'mid'
-            }
-        anchor_by_ha = {
-            'right': 'east',
-            'left': 'west',
-            'center': ''
-            }
-        anchor = (f"{anchor_by_va[self.mpl_text.get_va()]} "
-                  f"{anchor_by_ha[self.mpl_text.get_ha()]}")
-        if anchor == ' ':
-            anchor = 'center'
-        return anchor
+        return get_tikz_anchor(self.mpl_text)
 
     @cached_property
     def visible(self) -> bool:
@@ -126,10 +121,7 @@ class FigureText:
         return self.mpl_text.get_usetex()
 
     def get_fontsize(self, scale=1.0) -> str:
-        mpl_fontsize = scale*self.mpl_text.get_fontsize()
-        for latex_size, maxsize in fontsize_map.items():
-            if mpl_fontsize <= maxsize:
-                return latex_size
+        return latex_fontsize(self.mpl_text.get_fontsize(), scale=scale)
 
     @cached_property
     def _display_xy(self):
@@ -154,80 +146,433 @@ class FigureText:
         else:
             return False
 
+def get_tikz_anchor(text: Text, /) -> str:
+    anchor_by_va = {
+        'bottom': 'south',
+        'top': 'north',
+        'center': '',
+        'baseline': 'base',
+        'center_baseline': 'mid'
+        }
+    anchor_by_ha = {
+        'right': 'east',
+        'left': 'west',
+        'center': ''
+        }
+    anchor = (f"{anchor_by_va[text.get_va()]} "
+              f"{anchor_by_ha[text.get_ha()]}")
+    if anchor == ' ':
+        anchor = 'center'
+    return anchor
+
+def locate(fig: Figure, text: list[FigureText], /):
+    """Find the positions and visibility of many text elements at once.
+
+    The results are stored in the cached properties of each element.
+    """
+    if not text:
+        return
+    mpl_texts = [element.mpl_text for element in text]
+    axes = [element._ax for element in text]
+    display_xy, figure_xy, axes_xy = transform_positions(fig, mpl_texts, axes)
+    visible = get_visibility(mpl_texts, axes, axes_xy)
+    for i, element in enumerate(text):
+        cache = element.__dict__
+        cache['_display_xy'] = display_xy[i]
+        cache['_figure_xy'] = figure_xy[i]
+        if element._ax is not None:
+            cache['_axes_xy'] = axes_xy[i]
+        cache['visible'] = bool(visible[i])
+
+def transform_positions(fig: Figure, texts: list, axes: list, /) -> tuple:
+    """Transform text positions to display, figure and axes coordinates.
+
+    The positions of text sharing a transform are transformed together,
+    and the figure and axes transforms are inverted once each instead
+    of once per element. The axes coordinates of text outside any Axes
+    are NaN.
+    """
+    xy = np.array([text.get_position() for text in texts],
+                  dtype=float).reshape(-1, 2)
+    display_xy = np.empty_like(xy)
+    for transform, indices in _group_by(
+            [text.get_transform() for text in texts]):
+        display_xy[indices] = transform.transform(xy[indices])
+    figure_xy = fig.transFigure.inverted().transform(display_xy)
+    axes_xy = np.full_like(xy, np.nan)
+    for ax, indices in _group_by(axes):
+        if ax is not None:
+            axes_xy[indices] = ax.transAxes.inverted().transform(
+                display_xy[indices])
+    return display_xy, figure_xy, axes_xy
+
+def get_visibility(texts: list, axes: list, axes_xy, /):
+    """Boolean array telling which texts are visible."""
+    # The same test as in _is_inside_ax.
+    inside_ax = ((0 <= axes_xy) & (axes_xy <= 1)).any(axis=1)
+    return np.array([
+        text.get_visible()
+        and (ax is None or not text.get_clip_on() or inside)
+        for text, ax, inside in zip(texts, axes, inside_ax)
+        ], dtype=bool)
+
+def _group_by(items: list, /) -> list[tuple]:
+    """Group the indices of items by identity."""
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(id(item), (item, []))[1].append(i)
+    return list(groups.values())
+
 @beartype
-def extract_text(fig: plt.Figure, /, verbose: bool = False) -> set[FigureText]:
+def extract_records(fig: Figure, /, verbose: bool = False, *,
+                    counts: dict | None = None) -> list[TextRecord]:
+    """Extract the visible text of a figure as compact records.
+
+    The records are in the order of the artist tree. If a dict is given
+    as counts, the number of kept and removed text elements are put in
+    it, with the keys 'kept', 'invisible', 'empty' and 'transparent'.
+    """
+    # The cheap checks are made first, and only the remaining text is
+    # transformed to check whether it is clipped.
+    removed = {'Transparent': [], 'Empty': [], 'Invisible': []}
+    texts, axes, colors = [], [], []
+    for text, ax in walk_text(fig):
+        if not text.get_visible():
+            removed['Invisible'].append(text)
+        elif text.get_text() == '':
+            removed['Empty'].append(text)
+        elif (color := to_rgba(text.get_color()))[3] == 0:
+            removed['Transparent'].append(text)
+        else:
+            texts.append(text)
+            axes.append(ax)
+            colors.append(color)
+    _, figure_xy, axes_xy = transform_positions(fig, texts, axes)
+    visible = get_visibility(texts, axes, axes_xy)
+    records = []
+    for i, text in enumerate(texts):
+        if not visible[i]:
+            removed['Invisible'].append(text)
+            continue
+        x, y = figure_xy[i]
+        records.append(TextRecord(
+            text.get_text(),
+            float(x),
+            float(y),
+            get_tikz_anchor(text),
+            text.get_rotation(),
+            colors[i],
+            text.get_fontsize(),
+            bool(text.get_usetex()),
+            ))
+    if counts is not None:
+        counts['kept'] = len(records)
+        for reason, removed_texts in removed.items():
+            counts[reason.lower()] = len(removed_texts)
+    if verbose:
+        vprint = partial(print, end='\n', file=sys.stderr)
+        vprint("Adding the following text elements:")
+        for record in records:
+            vprint(record)
+        vprint("\nThese text elements were removed:")
+        for reason, removed_texts in removed.items():
+            vprint(f"{reason}:")
+            for text in removed_texts:
+                vprint(text)
+    return records
+
+@beartype
+def extract_text(fig: Figure, /, verbose: bool = False) -> list[FigureText]:
+    """Extract the visible text of a figure, in the order of the artist
+    tree."""
     if verbose:
         return verbose_extract_text(fig)
-    else:
-        return remove_transparent(remove_empty(remove_invisible(
-            set(get_text_decendents(fig)))))
+    candidates = list(
+        remove_transparent(remove_empty(get_text_decendents(fig))))
+    locate(fig, candidates)
+    return list(remove_invisible(candidates))
 
 @beartype
-def verbose_extract_text(fig: plt.Figure, /) -> set[FigureText]:
+def verbose_extract_text(fig: Figure, /) -> list[FigureText]:
     vprint = partial(print, end='\n', file=sys.stderr)
-    text = set(get_text_decendents(fig))
-    no_invisible = remove_invisible(text)
-    no_empty = remove_empty(no_invisible)
-    no_transparent = remove_transparent(no_empty)
+    removed = {'Transparent': [], 'Empty': [], 'Invisible': []}
+    candidates = []
+    for element in get_text_decendents(fig):
+        if element.text == '':
+            removed['Empty'].append(element)
+        elif element.color[3] == 0:
+            removed['Transparent'].append(element)
+        else:
+            candidates.append(element)
+    locate(fig, candidates)
+    kept = []
+    for element in candidates:
+        (kept if element.visible else removed['Invisible']).append(element)
     vprint("Adding the following text elements:")
-    for element in no_transparent:
+    for element in kept:
         vprint(element)
     vprint("\nThese text elements were removed:")
-    vprint("Transparent:")
-    for element in no_empty - no_transparent:
-        vprint(element)
-    vprint("Empty:")
-    for element in no_invisible - no_empty:
-        vprint(element)
-    vprint("Invisible:")
-    for element in text - no_invisible:
-        vprint(element)
-    return no_transparent
+    for reason, elements in removed.items():
+        vprint(f"{reason}:")
+        for element in elements:
+            vprint(element)
+    return kept
 
-def remove_invisible(text_set: set, /) -> set:
-    return {element for element in text_set if element.visible}
+def remove_invisible(text: Iterable[FigureText], /) -> Iterator[FigureText]:
+    return (element for element in text if element.visible)
 
-def remove_empty(text_set: set, /) -> set:
-    return {element for element in text_set if element.text != ''}
+def remove_empty(text: Iterable[FigureText], /) -> Iterator[FigureText]:
+    return (element for element in text if element.text != '')
 
-def remove_transparent(text_set: set, /) -> set:
-    return {element for element in text_set if element.color[3] != 0}
+def remove_transparent(text: Iterable[FigureText], /) -> Iterator[FigureText]:
+    return (element for element in text if element.color[3] != 0)
 
 @beartype
-def make_all_transparent(fig: plt.Figure, /) -> dict:
+def make_all_transparent(
+        fig: Figure, /, texts: list[FigureText] | None = None) -> dict:
+    """Make all text in the figure transparent, and return the old colors.
+
+    If the text of the figure has already been found, e.g. with
+    get_text_decendents, pass it as texts to avoid walking the figure.
+    """
+    if texts is None:
+        texts = get_text_decendents(fig)
     removed_colors = {}
-    for text in get_text_decendents(fig):
+    for text in texts:
         removed_colors[text.mpl_text] = text.color
         text.color = "none"  # avoids messing with the whitespace
     return removed_colors
 
 @beartype
-def restore_colors(fig: plt.Figure, colors: dict):
-    for text in get_text_decendents(fig):
-        text.color = colors[text.mpl_text]
+def restore_colors(fig: Figure, colors: dict):
+    """Give the text the colors returned by make_all_transparent."""
+    for mpl_text, color in colors.items():
+        mpl_text.set_color(color)
 
-@beartype
-def get_text_decendents(fig: plt.Figure, /) -> Iterator[FigureText]:
-    stack = [iter(fig.get_children())]
-    current_ax = [None]
-    while stack:
+class TextSuppressingRenderer:
+    """Wrap a renderer, passing on everything except drawing text.
+
+    Only given to the artists whose text is extracted, see
+    suppress_extracted_text.
+    """
+    def __init__(self, renderer):
+        object.__setattr__(self, '_renderer', renderer)
+
+    def __getattr__(self, name):
+        return getattr(self._renderer, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._renderer, name, value)
+
+    def draw_text(self, *args, **kwargs):
+        pass
+
+    def draw_tex(self, *args, **kwargs):
+        pass
+
+@contextmanager
+def render_without_text(
+        fig: Figure, /, *, verbose: bool = False, add_anchors: bool = False,
+        report: SaveReport | None = None, extract_once: bool = False,
+        lay_out: bool = True
+        ):
+    """Leave out the text when drawing the figure, and extract it instead.
+
+    Inside the with block, drawing the figure, e.g. with savefig,
+    draws everything except text. The text is extracted during the
+    same draw, so the positions match the drawn figure, and put as
+    TextRecords in the list given by the context manager. If a report
+    is given, the extraction is timed and the text elements counted
+    in it. If extract_once is True, the text is only extracted during
+    the first draw, e.g. when the figure is saved in several formats.
+
+    The layout engine of the figure, if any, runs once at the figure's
+    dpi when the with block is entered, or not at all if lay_out is
+    False. Draws in the with block keep that layout, so the graphics
+    match the extracted text even though savefig would otherwise lay
+    out the figure again at the dpi of each format.
+
+    No artist is changed: the text is left out by the renderer passed
+    to the artists whose text is extracted, so text which is not
+    extracted, e.g. in table cells, stays in the graphics. The figure's
+    lock is held in the with block, so
+    other threads using render_without_text on the same figure wait,
+    and draws from other threads, e.g. a GUI redraw, wait and then
+    draw the text as usual.
+    """
+    text = []
+    extracted = False
+    owners = None  # Found in the first draw, and reused in the others.
+    owner = threading.get_ident()
+    lock = figure_lock(fig)
+    def draw(renderer):
+        nonlocal extracted, owners
+        if threading.get_ident() != owner:
+            with lock:
+                return type(fig).draw(fig, renderer)
+        if getattr(fig.canvas, '_is_saving', False) and _lays_out(fig):
+            # savefig draws once to do the layout, and then draws again
+            # with the layout engine switched off. Keep the layout.
+            return
+        if owners is None:
+            owners = list(_text_owners(fig))
+        with keep_layout(fig), suppress_extracted_text(fig, owners):
+            type(fig).draw(fig, renderer)
+        if not (extract_once and extracted):
+            if report is None:
+                text[:] = extract_records(fig, verbose and not extracted)
+            else:
+                with report.time('extract'):
+                    text[:] = extract_records(
+                        fig, verbose and not extracted, counts=report.counts)
+            extracted = True
+        if add_anchors:
+            draw_anchor_markers(
+                fig, renderer, [(record.x, record.y) for record in text])
+    with lock:
+        if lay_out and fig.axes and _lays_out(fig):
+            try:
+                fig.get_layout_engine().execute(fig)
+            except ValueError:  # As in Figure.draw
+                pass
+        outer_draw = fig.__dict__.get('draw')  # When nested.
+        fig.draw = draw
         try:
-            child = next(stack[-1])
-            if isinstance(child, plt.Text):
-                yield FigureText(text=child, fig=fig, ax=current_ax[-1])
+            yield text
+        finally:
+            if outer_draw is None:
+                del fig.draw
+            else:
+                fig.draw = outer_draw
+
+@contextmanager
+def keep_layout(fig: Figure, /):
+    """Draw the figure without running its layout engine inside the
+    with block.
+
+    The layout engine itself is kept, so that the figure looks the same
+    to other code, and only its execute method is skipped.
+    """
+    layout_engine = fig.get_layout_engine()
+    if layout_engine is None:
+        yield
+        return
+    previous = vars(layout_engine).get('execute')
+    layout_engine.execute = _skip_layout
+    try:
+        yield
+    finally:
+        if previous is None:
+            del layout_engine.execute
+        else:
+            layout_engine.execute = previous
+
+def _skip_layout(fig):
+    pass
+
+def _lays_out(fig: Figure, /) -> bool:
+    """Whether drawing the figure runs a layout engine."""
+    layout_engine = fig.get_layout_engine()
+    return (layout_engine is not None
+            and not isinstance(layout_engine, PlaceHolderLayoutEngine))
+
+@contextmanager
+def suppress_extracted_text(fig: Figure, /, artists: list | None = None):
+    """Draw the artists whose text is extracted without their text.
+
+    Every Text found by walk_text, and every Axis, which may make new
+    tick labels while it is drawn, gets a draw method passing it a
+    TextSuppressingRenderer until the with block exits. Other artists
+    draw their text as usual. The artists are found by walking the
+    figure, unless a list of them from an earlier walk is given.
+    """
+    if artists is None:
+        artists = list(_text_owners(fig))
+    previous = [vars(artist).get('draw') for artist in artists]
+    for artist in artists:
+        artist.draw = partial(_draw_without_text, artist)
+    try:
+        yield
+    finally:
+        for artist, draw in zip(artists, previous):
+            if draw is None:
+                del artist.draw
             else:
-                if isinstance(child, plt.Axes):
-                    current_ax.append(child)
-                else:
-                    current_ax.append(current_ax[-1]) # Still in the same Axes
+                artist.draw = draw
+
+def _draw_without_text(artist: Artist, renderer):
+    type(artist).draw(artist, TextSuppressingRenderer(renderer))
+
+def _text_owners(fig: Figure, /) -> Iterator[Artist]:
+    """The Text and Axis artists found when walking the figure as in
+    walk_text, without descending into the Axis."""
+    stack = [iter(fig.get_children())]
+    while stack:
+        for child in stack[-1]:
+            kind = _artist_kinds.get(type(child)) or _artist_kind(type(child))
+            if kind is _TEXT or isinstance(child, Axis):
+                yield child
+            elif kind is _BRANCH:
                 stack.append(iter(child.get_children()))
-        except StopIteration:
-            if current_ax[-1] != None:
-                current_ax.pop()
+                break
+        else:
             stack.pop()
 
+_figure_locks = weakref.WeakKeyDictionary()
+_figure_locks_lock = threading.Lock()
+
+def figure_lock(fig: Figure, /) -> threading.RLock:
+    """The lock held by matplatex while drawing a figure."""
+    with _figure_locks_lock:
+        try:
+            return _figure_locks[fig]
+        except KeyError:
+            lock = _figure_locks[fig] = threading.RLock()
+            return lock
+
+@beartype
+def get_text_decendents(fig: Figure, /) -> Iterator[FigureText]:
+    for text, ax in walk_text(fig):
+        yield FigureText(text=text, fig=fig, ax=ax)
+
+@beartype
+def walk_text(fig: Figure, /) -> Iterator[tuple]:
+    """Find all Text in a figure, along with the Axes containing it.
+
+    The Text is found in the order of the artist tree. Artists whose
+    type cannot have children are not descended into.
+    """
+    stack = [(iter(fig.get_children()), None)]
+    while stack:
+        children, ax = stack[-1]
+        for child in children:
+            kind = _artist_kinds.get(type(child)) or _artist_kind(type(child))
+            if kind is _TEXT:
+                yield child, ax
+            elif kind is _BRANCH:
+                stack.append((iter(child.get_children()),
+                              child if isinstance(child, Axes) else ax))
+                break
+        else:
+            stack.pop()
+
+_TEXT, _LEAF, _BRANCH = 'text', 'leaf', 'branch'
+_artist_kinds = {}
+
+def _artist_kind(cls: type, /) -> str:
+    """Whether artists of a type are Text, cannot have children, or may
+    have children. Cached per type."""
+    if issubclass(cls, Text):
+        kind = _TEXT
+    elif cls.get_children is Artist.get_children:
+        kind = _LEAF
+    else:
+        kind = _BRANCH
+    _artist_kinds[cls] = kind
+    return kind
+
 @beartype
-def get_height_to_width(fig: plt.Figure) -> float:
+def get_height_to_width(fig: Figure) -> float:
     width, height = fig.get_size_inches()
     return height/width
 
@@ -236,7 +581,77 @@ def draw_anchors(fig, figure_xy):
     ax.plot(figure_xy[0], figure_xy[1], '+r', clip_on=False,
             transform=fig.transFigure, zorder=20)
 
-def replace_multiple(string: str, replacements: dict) -> str:
-    for key, val in replacements.items():
-        string = string.replace(key, val)
-    return string
+def draw_anchor_markers(fig, renderer, positions):
+    """Draw markers at the given positions directly with the renderer."""
+    if not positions:
+        return
+    markers = Line2D(*zip(*positions), marker='+', color='r', linestyle='none',
+                     transform=fig.transFigure, figure=fig)
+    markers.draw(renderer)
+
+@contextmanager
+def rasterize_dense(fig: Figure, /, threshold: int):
+    """Rasterize the collections and lines which have more than
+    threshold elements or vertices, inside the with block.
+
+    Gives the list of artists which were rasterized. Text, axes and
+    spines are left as vectors, as are artists which were already
+    rasterized.
+    """
+    dense = [artist for artist in fig.findobj(_is_rasterizable)
+             if not artist.get_rasterized()
+             and _count_elements(artist) > threshold]
+    for artist in dense:
+        artist.set_rasterized(True)
+    try:
+        yield dense
+    finally:
+        for artist in dense:
+            artist.set_rasterized(False)
+
+def rasterization_dpi(fig: Figure, /) -> float:
+    """Resolution for rasterized artists, from the size of the figure.
+
+    300 dpi, except that the longest side of the figure gets at most
+    MAX_RASTER_PIXELS pixels.
+    """
+    return min(MAX_RASTER_DPI, MAX_RASTER_PIXELS/max(fig.get_size_inches()))
+
+def _is_rasterizable(artist) -> bool:
+    return isinstance(artist, (Collection, Line2D))
+
+def _count_elements(artist) -> int:
+    """Number of data points, paths or vertices drawn by an artist."""
+    if isinstance(artist, Line2D):
+        return len(artist.get_xydata())
+    if isinstance(artist, QuadMesh):
+        return artist.get_coordinates()[..., 0].size
+    n_vertices = sum(len(path.vertices) for path in artist.get_paths())
+    return max(len(artist.get_offsets()), n_vertices)
+
+class _SnapshotPickler(pickle.Pickler):
+    """Pickle a figure without registering the copy with pyplot, and
+    without the draw methods set on its artists by matplatex."""
+    def reducer_override(self, obj):
+        if not isinstance(obj, Artist):
+            return NotImplemented
+        function, args, state, *rest = obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        if not isinstance(state, dict):
+            return (function, args, state, *rest)
+        state = dict(state)
+        state.pop('draw', None)
+        state.pop('_restore_to_pylab', None)
+        return (function, args, state, *rest)
+
+def snapshot_figure(fig: Figure, /) -> bytes:
+    """Pickle a figure, so that a copy can be rendered elsewhere.
+
+    Unlike pickle.dumps, the copy is not added to pyplot when it is
+    unpickled, so it can be rendered in another thread without opening
+    a window. The figure's lock is held while pickling, so that it is
+    not pickled in the middle of a save in another thread.
+    """
+    buffer = io.BytesIO()
+    with figure_lock(fig):
+        _SnapshotPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(fig)
+    return buffer.getvalue()
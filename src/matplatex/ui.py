@@ -16,27 +16,71 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import asyncio
+from collections.abc import Callable, Iterable, Sequence
+from contextlib import ExitStack
+from concurrent.futures import (
+    Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor)
+from functools import lru_cache
 from pathlib import Path
+import pickle
+import sys
+import time
+from typing import BinaryIO
 
 from beartype import beartype
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.figure import Figure
 
-from .tools import write_tex, make_all_transparent, restore_colors
-from .latex_input import LaTeXinput
+from .tools import (
+    write_tex, render_without_text, snapshot_figure, rasterize_dense,
+    rasterization_dpi, get_height_to_width)
+from .layout import write_frames
+from .latex_input import atomic_open, get_emitter, read_json
+from .report import SaveReport
+from .bundle import Bundle
+from .sidecar import FigureLayout, dumps_layout, layout_path
+from .cache import (
+    figure_fingerprint, graphics_fingerprint, tex_fingerprint,
+    write_fingerprints)
+
+VECTOR_FORMATS = {'pdf', 'svg', 'svgz', 'eps', 'ps', 'pgf'}
+# savefig options of the optimize profile. Metadata set to None is left
+# out of the file. The text is never drawn, so no fonts are embedded
+# in any case.
+_NO_SVG_METADATA = {'Creator': None, 'Date': None, 'Format': None, 'Type': None}
+OPTIMIZED_SAVEFIG = {
+    'pdf': {'metadata': {'Creator': None, 'Producer': None,
+                         'CreationDate': None}},
+    'svg': {'metadata': _NO_SVG_METADATA},
+    'svgz': {'metadata': _NO_SVG_METADATA},
+    'png': {'metadata': {'Software': None}},
+    }
+OPTIMIZED_RCPARAMS = {'pdf.compression': 9}
 
 @beartype
 def save(
-        figure: plt.Figure,
+        figure: Figure,
         filename: str | Path,
         *,
-        format: str = 'pdf',
+        format: str | Sequence[str] = 'pdf',
         widthcommand: str = r"\figurewidth",
         scale_fontsize: float | bool = False,
         draw_anchors: bool = False,
         externalize: bool = False,
         trim: bool = False,
+        compact: bool = False,
+        precision: int = 4,
+        emitter: str = 'tikz',
+        replacements: dict[str, str] | None = None,
+        rasterize_threshold: int | None = None,
+        optimize: bool = False,
+        cache: bool = False,
+        bundle: Bundle | None = None,
+        layout: bool = False,
+        report: bool | Callable[[SaveReport], object] = False,
         verbose: int = 1
-        ):
+        ) -> SaveReport | None:
     """Save matplotlib Figure with text in a separate tex file.
 
     Arguments
@@ -45,11 +89,14 @@ def save(
     filename    The name to use for the files, without extention. This
                 will create the files:
                 - <filename>.tex
-                - <filename>.gfx.<format>
+                - <filename>.gfx.<format>, for each format
 
     Optional keyword arguments
     --------------------------
-    format          The format in which to save the no-text figure.
+    format          The format in which to save the no-text figure, or
+                    a list of formats. The text is extracted and the
+                    tex file written once, and includes the graphics
+                    file of the first format.
     widthcommand    The LaTeX length command which will be used to
                     define the width of the figure.
     scale_fontsize  Map the fontsizes in the figure to LaTeX font sizes.
@@ -62,38 +109,504 @@ def save(
                     externalization.
     trim            Trim LaTeX bounding box to figure size, ignore
                     overflowing text.
+    compact         Define each distinct text style once and leave out
+                    default values, for smaller tex files.
+    precision       Number of decimals in the text coordinates.
+    emitter         'tikz' to place the text with tikz nodes, or 'pgf'
+                    to use the basic layer of PGF, which compiles
+                    faster for figures with many labels and only
+                    needs package pgf.
+    replacements    Dict of strings to replace in the text, e.g. LaTeX
+                    escapes like {'%': '\\%'}, in addition to the
+                    defaults in settings.Replacements. All keys are
+                    replaced in a single pass, so replaced text is not
+                    replaced again.
+    rasterize_threshold
+                    If given, rasterize every collection and line with
+                    more than this many data points or vertices in the
+                    graphics file, at up to 300 dpi. Text, axes and
+                    spines stay vector graphics. Only used for vector
+                    formats.
+    optimize        If True, make the graphics files as small as
+                    possible: leave out the metadata of pdf, svg and
+                    png files and use the strongest compression of pdf
+                    streams.
+    cache           If True, store fingerprints of the figure and the
+                    tex code in <filename>.cache.json, and only write
+                    the files whose fingerprints have changed since the
+                    last save. Files which are not written keep their
+                    modification times.
+    bundle          If given, write the files as members of this
+                    bundle.Bundle instead of to the file system, e.g. a
+                    MemoryBundle, ZipBundle or TarBundle. filename is
+                    then the name of the members, relative to the root
+                    of the bundle. Can not be combined with cache.
+    layout          If True, also write the extracted text layout to
+                    <filename>.layout.json, from which the tex file can
+                    be written again with other options by retex,
+                    without the figure.
+    report          If True, return a SaveReport with the time spent in
+                    each phase, the number of kept and removed text
+                    elements and the sizes of the files. If a callable
+                    is given, it is called with the SaveReport instead.
     verbose: int    0: Print nothing.
                     1: Print save message to stdout. (default)
                     2: Also print runtime info to stderr.
     """
+    if cache and bundle is not None:
+        raise ValueError("cache can not be used with a bundle")
+    output_class = get_emitter(emitter)
     filepath = Path(filename)
-    graphics_path = filepath.with_name(f'{filepath.name}.gfx.{format}')
+    formats = _as_formats(format)
+    graphics_paths = {fmt: filepath.with_name(f'{filepath.name}.gfx.{fmt}')
+                      for fmt in formats}
+    graphics_path = graphics_paths[formats[0]]
+    latex_path = filepath.with_name(f'{filepath.name}.tex')
+    save_report = SaveReport(
+        str(filename), format if isinstance(format, str) else formats)
+    start = time.perf_counter()
+
+    with render_without_text(
+            figure,
+            verbose=(verbose==2),
+            add_anchors=draw_anchors,
+            report=save_report,
+            extract_once=True
+            ) as text:
+        if cache:
+            with save_report.time('fingerprint'):
+                # Draw to extract the text and bring the figure up to date.
+                figure.draw_without_rendering()
+                cache_path = filepath.with_name(f'{filepath.name}.cache.json')
+                stored = read_json(cache_path)
+                fingerprints = {'graphics': figure_fingerprint(
+                    figure,
+                    format=formats[0] if len(formats) == 1 else formats,
+                    draw_anchors=draw_anchors,
+                    rasterize_threshold=rasterize_threshold,
+                    optimize=optimize
+                    )}
+            if fingerprints['graphics'] != stored.get('graphics'):
+                to_render = formats
+            else:
+                to_render = [fmt for fmt in formats
+                             if not graphics_paths[fmt].exists()]
+        else:
+            to_render = formats
+        for fmt in to_render:
+            with save_report.time('savefig'):
+                if bundle is None:
+                    _savefig(figure, graphics_paths[fmt], fmt,
+                             rasterize_threshold, optimize=optimize)
+                    continue
+                member = graphics_paths[fmt].as_posix()
+                with bundle.open(member, binary=True) as file:
+                    _savefig(figure, file, fmt, rasterize_threshold,
+                             optimize=optimize)
+    def write_code(sink=None):
+        output = output_class(
+            widthcommand=widthcommand,
+            externalize=externalize,
+            trim=trim,
+            compact=compact,
+            precision=precision,
+            sink=sink
+            )
+        with save_report.time('write_tex'):
+            write_tex(
+                output,
+                figure,
+                graphics=graphics_path.relative_to(filepath.parent),
+                text=text,
+                scale_fontsize=scale_fontsize,
+                replacements=replacements,
+                )
+            output.close()
+        return output
+    written = []
+    if cache:
+        # The code is kept to compare its fingerprint with the stored one.
+        output = write_code()
+        fingerprints['tex'] = tex_fingerprint(output.latexcode)
+        if fingerprints['tex'] != stored.get('tex') or not latex_path.exists():
+            with save_report.time('write'):
+                if bundle is None:
+                    output.write(latex_path)
+                else:
+                    with bundle.open(latex_path.as_posix()) as file:
+                        output.write_to(file)
+            written.append(latex_path)
+    else:
+        # Stream the code to the file instead of keeping it in memory.
+        with save_report.time('write'), ExitStack() as stack:
+            if bundle is None:
+                file = stack.enter_context(atomic_open(latex_path))
+            else:
+                file = stack.enter_context(bundle.open(latex_path.as_posix()))
+            write_code(sink=file)
+        written.append(latex_path)
+    sidecar_path = layout_path(filepath)
+    if layout:
+        layout_code = dumps_layout(FigureLayout(
+            graphics_path.relative_to(filepath.parent).as_posix(),
+            float(get_height_to_width(figure)),
+            tuple(text)
+            ))
+        if cache:
+            # The records hold more than the tex code, e.g. font sizes.
+            fingerprints['layout'] = tex_fingerprint(layout_code)
+            write_layout = (fingerprints['layout'] != stored.get('layout')
+                            or not sidecar_path.exists())
+        else:
+            write_layout = True
+    if layout and write_layout:
+        if bundle is None:
+            with atomic_open(sidecar_path) as file:
+                file.write(layout_code)
+        else:
+            with bundle.open(sidecar_path.as_posix()) as file:
+                file.write(layout_code)
+        written.append(sidecar_path)
+    if cache:
+        # Only once every file is written, so that a failed write is
+        # not taken as up to date by the next save.
+        write_fingerprints(cache_path, fingerprints)
+    written.extend(graphics_paths[fmt] for fmt in to_render)
+    save_report.times['total'] = time.perf_counter() - start
+    if verbose:
+        if bundle is not None:
+            print(f"Figure written to {type(bundle).__name__} members "
+                  f"{' and '.join(path.as_posix() for path in written)}")
+        elif written:
+            print(f"Figure written to files {' and '.join(map(str, written))}")
+        else:
+            all_paths = [latex_path, *graphics_paths.values()]
+            print(f"Files {' and '.join(map(str, all_paths))} are up to date")
+    if report:
+        save_report.written = list(map(str, written))
+        if bundle is None:  # The members of a bundle may not be readable.
+            save_report.sizes = {'tex': latex_path.stat().st_size}
+            for fmt, path in graphics_paths.items():
+                save_report.sizes[f'graphics.{fmt}'] = path.stat().st_size
+            save_report.sizes['graphics'] = sum(
+                save_report.sizes[f'graphics.{fmt}'] for fmt in formats)
+        if callable(report):
+            report(save_report)
+        else:
+            return save_report
+
+
+@beartype
+def save_many(
+        jobs: Iterable[tuple],
+        *,
+        max_workers: int | None = None,
+        **options
+        ) -> dict[str, BaseException]:
+    """Save several figures in parallel, each in a separate process.
+
+    Arguments
+    ---------
+    jobs    Iterable of tuples (factory, filename) or
+            (factory, filename, options), where
+            - factory is a callable taking no arguments and returning
+              the Figure to save. It is called in the worker process,
+              so it must be picklable, i.e. defined at module level.
+            - filename is passed on to save.
+            - options is a dict of keyword arguments to save, which
+              take precedence over those given to save_many.
+
+    Optional keyword arguments
+    --------------------------
+    max_workers     The number of worker processes. Defaults to the
+                    number of processors on the machine.
+    All other keyword arguments are passed on to save.
+
+    Returns a dict mapping the filename of every figure that failed to
+    the exception that was raised. A failing figure does not stop the
+    other figures from being saved.
+    """
+    failed = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for job in jobs:
+            factory, filename, *job_options = job
+            job_options = options | (job_options[0] if job_options else {})
+            future = executor.submit(_save_job, factory, filename, job_options)
+            futures[str(filename)] = future
+        for filename, future in futures.items():
+            if (error := future.exception()) is not None:
+                failed[filename] = error
+    return failed
+
+def _save_job(factory: Callable, filename, options: dict):
+    """Make a figure and save it. Runs in a worker process."""
+    figure = factory()
+    try:
+        save(figure, filename, **options)
+    finally:
+        # The factory may have made the figure with pyplot, which keeps
+        # a reference to it. Without pyplot, there is nothing to close.
+        if (pyplot := sys.modules.get('matplotlib.pyplot')) is not None:
+            pyplot.close(figure)
+
+
+@beartype
+def save_async(
+        figure: Figure,
+        filename: str | Path,
+        *,
+        format: str | Sequence[str] = 'pdf',
+        widthcommand: str = r"\figurewidth",
+        scale_fontsize: float | bool = False,
+        draw_anchors: bool = False,
+        externalize: bool = False,
+        trim: bool = False,
+        compact: bool = False,
+        precision: int = 4,
+        emitter: str = 'tikz',
+        replacements: dict[str, str] | None = None,
+        rasterize_threshold: int | None = None,
+        optimize: bool = False,
+        executor: Executor | None = None,
+        verbose: int = 1
+        ) -> Future:
+    """Save like save, but render the graphics in the background.
+
+    The text is extracted and the tex file written before returning,
+    and a snapshot of the figure is taken, so the figure can be changed
+    or closed right away. The snapshot is rendered without text by the
+    executor, and the returned Future gives the path of the graphics
+    file, or raises the error from rendering it.
+
+    Arguments
+    ---------
+    As for save, except that the cache, report, bundle and layout
+    options are not available. If format is a list, the Future gives a
+    list of paths.
+
+    Optional keyword arguments
+    --------------------------
+    executor    A concurrent.futures Executor in which to render the
+                graphics. Defaults to a single background thread
+                shared by all calls, which renders the figures one by
+                one in the order they were saved. Give a
+                ProcessPoolExecutor to render several figures in
+                parallel.
+
+    To wait for the graphics in asyncio code, use asave, or
+    asyncio.wrap_future on the returned Future.
+    """
+    output_class = get_emitter(emitter)
+    filepath = Path(filename)
+    formats = _as_formats(format)
+    graphics_paths = [filepath.with_name(f'{filepath.name}.gfx.{fmt}')
+                      for fmt in formats]
     latex_path = filepath.with_name(f'{filepath.name}.tex')
 
-    figure.draw_without_rendering() # Must draw text before it can be extracted.
-    layout_engine = figure.get_layout_engine()
-    figure.set_layout_engine('none') # Don't change the figure after this.
-    output = LaTeXinput(
+    with render_without_text(figure, verbose=(verbose==2)) as text:
+        figure.draw_without_rendering()
+    snapshot = snapshot_figure(figure)
+    output = output_class(
         widthcommand=widthcommand,
         externalize=externalize,
-        trim=trim
+        trim=trim,
+        compact=compact,
+        precision=precision
         )
     write_tex(
         output,
         figure,
-        graphics=graphics_path.relative_to(filepath.parent),
+        graphics=graphics_paths[0].relative_to(filepath.parent),
+        text=text,
+        scale_fontsize=scale_fontsize,
+        replacements=replacements,
+        )
+    output.write(latex_path)
+
+    if executor is None:
+        executor = _background_executor()
+    render = executor.submit(
+        _render_snapshot, snapshot, dict(zip(formats, graphics_paths)),
+        draw_anchors, rasterize_threshold, optimize)
+    if isinstance(format, str):
+        future = Future()
+        def unpack(render):
+            if (error := render.exception()) is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(render.result()[0])
+        render.add_done_callback(unpack)
+    else:
+        future = render
+    if verbose:
+        def report(future):
+            if future.exception() is None:
+                written = [latex_path, *graphics_paths]
+                print("Figure written to files "
+                      f"{' and '.join(map(str, written))}")
+        future.add_done_callback(report)
+    return future
+
+async def asave(figure: Figure, filename: str | Path, **options) -> Path:
+    """Save a figure from asyncio code without blocking the event loop
+    while the graphics are rendered.
+
+    Takes the same arguments as save_async. Returns the path of the
+    graphics file once it is written.
+    """
+    return await asyncio.wrap_future(save_async(figure, filename, **options))
+
+@lru_cache(maxsize=None)
+def _background_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix='matplatex-render')
+
+def _render_snapshot(
+        snapshot: bytes,
+        graphics_paths: dict[str, Path],
+        draw_anchors: bool,
+        rasterize_threshold: int | None,
+        optimize: bool = False
+        ) -> list[Path]:
+    """Render a pickled figure without text in each format. Runs in the
+    executor.
+
+    The snapshot is taken after the layout which the text was extracted
+    from, so it is rendered without laying it out again.
+    """
+    figure = pickle.loads(snapshot)
+    with render_without_text(
+            figure, add_anchors=draw_anchors, extract_once=True,
+            lay_out=False):
+        for format, graphics_path in graphics_paths.items():
+            _savefig(figure, graphics_path, format, rasterize_threshold,
+                     optimize=optimize)
+    return list(graphics_paths.values())
+
+def _as_formats(format: str | Sequence[str]) -> list[str]:
+    """The graphics formats to save, as a list."""
+    formats = [format] if isinstance(format, str) else list(format)
+    if not formats:
+        raise ValueError("At least one format must be given")
+    return formats
+
+def _savefig(
+        figure: Figure,
+        graphics_path: Path | BinaryIO,
+        format: str,
+        rasterize_threshold: int | None,
+        *,
+        optimize: bool = False
+        ):
+    """Save the graphics to a file name or binary file object,
+    rasterizing dense artists and optimizing the file if asked to."""
+    options = dict(OPTIMIZED_SAVEFIG.get(format, {})) if optimize else {}
+    with ExitStack() as stack:
+        if optimize:
+            stack.enter_context(mpl.rc_context(OPTIMIZED_RCPARAMS))
+        if rasterize_threshold is not None and format in VECTOR_FORMATS:
+            if stack.enter_context(
+                    rasterize_dense(figure, rasterize_threshold)):
+                options['dpi'] = rasterization_dpi(figure)
+        figure.savefig(graphics_path, format=format, **options)
+
+
+@beartype
+def save_frames(
+        figure: Figure,
+        filename: str | Path,
+        frames: Sequence[Callable[[Figure], object]],
+        *,
+        format: str = 'pdf',
+        widthcommand: str = r"\figurewidth",
+        scale_fontsize: float | bool = False,
+        trim: bool = False,
+        compact: bool = False,
+        precision: int = 4,
+        emitter: str = 'tikz',
+        replacements: dict[str, str] | None = None,
+        rasterize_threshold: int | None = None,
+        optimize: bool = False,
+        overlay: str = 'only',
+        verbose: int = 1
+        ):
+    """Save a sequence of beamer overlays which differ only in text.
+
+    The graphics are rendered once, and a single tex file is written
+    in which the text that is not on every overlay is wrapped in
+    \\only<n> or \\visible<n>. Input it in a beamer frame, e.g. with a
+    figure of width matplatex.Beamer.width(169).
+
+    Arguments
+    ---------
+    figure      The matplotlib Figure to save.
+    filename    As for save.
+    frames      Sequence of callables, one per overlay, each taking the
+                figure and changing its text, e.g. setting the text,
+                colour or visibility of annotations. They are called in
+                order, so each starts from the state left by the one
+                before, and the figure is left in the state of the last
+                one. The graphics are rendered in the state of the
+                first one, so the frames must not change anything but
+                text. The boxes and arrows of annotations are part of
+                the graphics, so an annotation with an arrow must be
+                visible in every frame or in none. A ValueError is
+                raised if a frame changes the graphics.
+
+    Optional keyword arguments
+    --------------------------
+    overlay     'only' or 'visible', the beamer command to use.
+    The others are as for save.
+    """
+    if overlay not in ('only', 'visible'):
+        raise ValueError(
+            f"overlay must be 'only' or 'visible', not {overlay!r}")
+    if not frames:
+        raise ValueError("At least one frame must be given")
+    output_class = get_emitter(emitter)
+    filepath = Path(filename)
+    graphics_path = filepath.with_name(f'{filepath.name}.gfx.{format}')
+    latex_path = filepath.with_name(f'{filepath.name}.tex')
+
+    frame_records = []
+    with render_without_text(figure, verbose=(verbose==2)) as text:
+        for number, frame in enumerate(frames):
+            frame(figure)
+            # The text of every frame is found with the same kind of
+            # draw, so that text which does not change is at exactly
+            # the same position.
+            figure.draw_without_rendering()
+            frame_records.append(list(text))
+            if number == 0:
+                graphics = graphics_fingerprint(figure)
+                _savefig(figure, graphics_path, format, rasterize_threshold,
+                         optimize=optimize)
+            elif graphics_fingerprint(figure) != graphics:
+                raise ValueError(
+                    f"Frame {number + 1} changes more than text, which "
+                    "would be missing from the graphics")
+    output = output_class(
+        widthcommand=widthcommand,
+        externalize=False,
+        trim=trim,
+        compact=compact,
+        precision=precision
+        )
+    output.includegraphics(
+        graphics_path.relative_to(filepath.parent),
+        get_height_to_width(figure))
+    write_frames(
+        output,
+        frame_records,
+        command=f'\\{overlay}',
         scale_fontsize=scale_fontsize,
-        add_anchors=draw_anchors,
-        verbose=(verbose==2)
+        replacements=replacements
         )
     output.write(latex_path)
-    color_backup = make_all_transparent(figure)
-    figure.savefig(graphics_path, format=format)
     if verbose:
-        print(f"Figure written to files {latex_path} and {graphics_path}")
-    # restore figure
-    restore_colors(figure, color_backup)
-    figure.set_layout_engine(layout_engine)
+        print(f"{len(frames)} frames written to files {latex_path} and "
+              f"{graphics_path}")
 
 
 def print_family_tree(mpl_object):
@@ -0,0 +1,27 @@
+import matplotlib.pyplot as plt
+import pytest
+
+
+@pytest.fixture
+def pyplot():
+    """Whether the figure is made through pyplot, which manages it."""
+    return False
+
+@pytest.fixture
+def figure_options():
+    """Keyword arguments to the figure, e.g. figsize or layout."""
+    return {}
+
+@pytest.fixture
+def figure(pyplot, figure_options):
+    """A figure with one line and an x axis label.
+
+    Test modules vary it by overriding pyplot or figure_options, and add
+    to it by overriding figure with a fixture which requests figure.
+    """
+    fig = plt.figure(**figure_options) if pyplot else plt.Figure(**figure_options)
+    ax = fig.add_subplot()
+    ax.plot([0, 1, 2], [2, 0, 1])
+    ax.set_xlabel("x axis label")
+    yield fig
+    plt.close(fig)
@@ -0,0 +1,142 @@
+"""Compile time, TeX memory and pdf size of the generated figures.
+
+Run from the repository root with
+    python -m tests.latex_benchmark [options]
+See python -m tests.latex_benchmark --help for the options.
+
+Figures with a growing number of labels are saved with each emitter
+style and compiled with pdflatex in the documents of latex_test_code.
+For the externalized document, the figure job is measured, since that
+is where the text is typeset. The memory is the main memory of TeX in
+words, as reported with \\tracingstats. The results can be stored as a
+local baseline, which later runs, and test_latex_benchmark, compare
+against.
+"""
+import argparse
+import json
+from pathlib import Path
+import random
+import re
+from subprocess import run, DEVNULL
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+from matplotlib.figure import Figure
+
+from matplatex import save
+
+from .latex_test_code import MWE, TIKZEXTERNALIZE
+
+BASELINE = Path(__file__).with_name('latex_baseline.json')
+SIZES = (10, 100, 1000)
+STYLES = {
+    'tikz': {},
+    'compact': {'compact': True},
+    'pgf': {'emitter': 'pgf'},
+    }
+TEMPLATES = {'mwe': MWE, 'externalize': TIKZEXTERNALIZE}
+# A result is a regression when it is this many times the baseline.
+# Compile times are noisy, while memory and size are deterministic.
+TOLERANCES = {'seconds': 1.5, 'memory': 1.05, 'pdf_size': 1.05}
+
+_memory = re.compile(r'(\d+) words of memory out of')
+
+
+def text_figure(n_text: int, /) -> Figure:
+    """A figure with n_text labels at fixed random positions."""
+    rng = random.Random(0)
+    fig = Figure(figsize=(4, 3))
+    ax = fig.add_subplot()
+    ax.plot([0, 1], [0, 1])
+    ax.set_xlabel("x axis label")
+    ax.set_ylabel("$y$ axis label")
+    for i in range(n_text):
+        ax.annotate(f"{i}", (rng.random(), rng.random()), fontsize=6,
+                    color=f'C{i % 10}')
+    return fig
+
+def compile_stats(directory: Path, jobname: str = 'document') -> dict:
+    """Compile document.tex in directory as jobname and measure it."""
+    start = time.perf_counter()
+    run(['pdflatex', '-interaction=nonstopmode', '-halt-on-error',
+         f'--jobname={jobname}', 'document.tex'],
+        cwd=directory, stdout=DEVNULL, stdin=DEVNULL, check=True)
+    seconds = time.perf_counter() - start
+    log = (directory / f'{jobname}.log').read_text(errors='replace')
+    return {
+        'seconds': seconds,
+        'memory': int(_memory.search(log)[1]),
+        'pdf_size': (directory / f'{jobname}.pdf').stat().st_size,
+        }
+
+def measure(n_text: int, template: str, style: str) -> dict:
+    """Save a figure and measure its compilation."""
+    externalize = template == 'externalize'
+    with TemporaryDirectory() as directory:
+        directory = Path(directory)
+        document = TEMPLATES[template].replace(
+            r'\documentclass', r'\tracingstats=2 \documentclass', 1)
+        (directory / 'document.tex').write_text(document, encoding='utf-8')
+        save(text_figure(n_text), directory / 'figure',
+             externalize=externalize, verbose=0, **STYLES[style])
+        return compile_stats(
+            directory, 'figure.gfx_xt' if externalize else 'document')
+
+def run_cases(sizes=SIZES, styles=STYLES, templates=TEMPLATES) -> dict:
+    results = {}
+    for template in templates:
+        for style in styles:
+            for size in sizes:
+                name = f"{template}-{style}-{size}"
+                results[name] = measure(size, template, style)
+    return results
+
+def find_regressions(results: dict, baseline: dict,
+                     tolerances: dict = TOLERANCES) -> list[str]:
+    """Describe every result which is worse than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        for key, value in result.items():
+            reference = baseline.get(name, {}).get(key)
+            if reference is not None and value > tolerances[key]*reference:
+                regressions.append(
+                    f"{name} {key}: {value:.4g} against {reference:.4g}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.latex_benchmark',
+        description="Measure the pdflatex compilation of generated figures.")
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=SIZES,
+        help=f"Numbers of labels. Default: {' '.join(map(str, SIZES))}.")
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help=f"Store the results as the baseline in {BASELINE.name}.")
+    args = parser.parse_args(argv)
+
+    results = run_cases(args.sizes)
+    print(f"{'case':>24} {'compile':>8} {'memory':>9} {'pdf bytes':>10}")
+    for name, result in results.items():
+        print(f"{name:>24} {result['seconds']:7.2f}s {result['memory']:9d} "
+              f"{result['pdf_size']:10d}")
+    if args.save_baseline:
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        BASELINE.write_text(json.dumps(baseline | results, indent=2))
+        print(f"Baseline written to {BASELINE}")
+        return 0
+    if not BASELINE.exists():
+        print("No baseline to compare with, store one with --save-baseline.")
+        return 0
+    regressions = find_regressions(results, json.loads(BASELINE.read_text()))
+    if regressions:
+        print("\nRegressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import sys
+
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, compile_externalized
+from matplatex.build import find_externalized
+
+# Stands in for pdflatex: writes <jobname>.pdf, or fails for 'bad' jobs.
+FAKE_LATEX = """
+import sys
+jobname = sys.argv[1].removeprefix('--jobname=')
+if jobname.startswith('bad'):
+    sys.exit(1)
+with open(jobname + '.pdf', 'a') as file:
+    file.write('x')
+"""
+
+DOCUMENT = r"""
+\documentclass{article}
+\usepackage{import}
+\pgfrealjobname{document}
+\begin{document}
+\input{first}
+% \input{commented}
+\import{figures/}{second.tex}
+\input{other}
+\end{document}
+"""
+
+
+@pytest.fixture
+def document(tmp_path):
+    (tmp_path / 'figures').mkdir()
+    for filename in ['first', 'figures/second', 'commented']:
+        fig = plt.Figure()
+        fig.add_subplot().set_xlabel("x")
+        save(fig, tmp_path / filename, externalize=True, verbose=0)
+    save(fig, tmp_path / 'other', verbose=0)  # Not externalized.
+    path = tmp_path / 'document.tex'
+    path.write_text(DOCUMENT)
+    return path
+
+@pytest.fixture
+def command(tmp_path):
+    script = tmp_path / 'fake_latex.py'
+    script.write_text(FAKE_LATEX)
+    return (sys.executable, str(script))
+
+def test_find_externalized(document, tmp_path):
+    figures = find_externalized(document)
+    assert [figure.jobname for figure in figures] == [
+        'first.gfx_xt', 'second.gfx_xt']
+    assert figures[1].tex == (tmp_path / 'figures/second.tex').resolve()
+    assert figures[1].graphics.name == 'second.gfx.pdf'
+
+def test_compile(document, command, tmp_path):
+    summary = compile_externalized(document, command=command, verbose=0)
+    assert sorted(summary.compiled) == ['first.gfx_xt', 'second.gfx_xt']
+    assert (tmp_path / 'first.gfx_xt.pdf').exists()
+    assert (tmp_path / 'second.gfx_xt.pdf').exists()
+
+def test_unchanged_figures_are_skipped(document, command, tmp_path):
+    compile_externalized(document, command=command, verbose=0)
+    fig = plt.Figure()
+    fig.add_subplot().set_xlabel("changed")
+    save(fig, tmp_path / 'figures/second', externalize=True, verbose=0)
+    summary = compile_externalized(document, command=command, verbose=0)
+    assert summary.compiled == ['second.gfx_xt']
+    assert summary.skipped == ['first.gfx_xt']
+    assert (tmp_path / 'first.gfx_xt.pdf').read_text() == 'x'
+
+def test_missing_output_is_compiled(document, command, tmp_path):
+    compile_externalized(document, command=command, verbose=0)
+    (tmp_path / 'first.gfx_xt.pdf').unlink()
+    summary = compile_externalized(document, command=command, verbose=0)
+    assert summary.compiled == ['first.gfx_xt']
+
+def test_failures_are_collected(document, command, tmp_path):
+    fig = plt.Figure()
+    save(fig, tmp_path / 'bad', externalize=True, verbose=0)
+    document.write_text(DOCUMENT.replace(r'\input{other}', r'\input{bad}'))
+    summary = compile_externalized(document, command=command, verbose=0)
+    assert list(summary.failed) == ['bad.gfx_xt']
+    assert len(summary.compiled) == 2
+    summary = compile_externalized(document, command=command, verbose=0)
+    assert list(summary.failed) == ['bad.gfx_xt']
+
+def test_nested_inputs_are_relative_to_document(tmp_path):
+    for filename in ['figs/a', 'chapters/parts/b', 'chapters/c']:
+        (tmp_path / filename).parent.mkdir(parents=True, exist_ok=True)
+        fig = plt.Figure()
+        fig.add_subplot().set_xlabel("x")
+        save(fig, tmp_path / filename, externalize=True, verbose=0)
+    (tmp_path / 'chapters/ch1.tex').write_text("\\input{figs/a.tex}\n")
+    (tmp_path / 'chapters/ch2.tex').write_text(
+        "\\input{c}\n\\subimport{parts/}{b}\n")
+    document = tmp_path / 'document.tex'
+    document.write_text(
+        "\\input{chapters/ch1}\n\\import{chapters/}{ch2}\n")
+    figures = find_externalized(document)
+    assert [figure.tex for figure in figures] == [
+        (tmp_path / 'figs/a.tex').resolve(),
+        (tmp_path / 'chapters/c.tex').resolve(),
+        (tmp_path / 'chapters/parts/b.tex').resolve()]
@@ -0,0 +1,62 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from matplatex import save, MemoryBundle, ZipBundle, TarBundle
+from matplatex.bundle import Bundle
+
+
+class Unseekable(io.RawIOBase):
+    """A binary stream which can only be written to, like a socket."""
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+
+def test_memory_bundle_matches_files(figure, tmp_path):
+    save(figure, tmp_path / 'figure', verbose=0)
+    bundle = MemoryBundle()
+    save(figure, 'figure', bundle=bundle, verbose=0)
+    assert set(bundle.files) == {'figure.tex', 'figure.gfx.pdf'}
+    assert bundle.files['figure.tex'] == (tmp_path / 'figure.tex').read_bytes()
+    assert bundle.files['figure.gfx.pdf'].startswith(b'%PDF')
+
+def test_zip_bundle_to_unseekable_stream(figure):
+    stream = Unseekable()
+    with ZipBundle(stream) as bundle:
+        save(figure, 'figures/figure', format=['pdf', 'svg'],
+             bundle=bundle, verbose=0)
+    with zipfile.ZipFile(io.BytesIO(stream.data)) as archive:
+        assert sorted(archive.namelist()) == [
+            'figures/figure.gfx.pdf', 'figures/figure.gfx.svg',
+            'figures/figure.tex']
+        tex = archive.read('figures/figure.tex').decode()
+    assert r'\includegraphics[width=\figurewidth]{figure.gfx.pdf}' in tex
+
+@pytest.mark.parametrize('compression', ['', 'gz'])
+def test_tar_bundle(figure, tmp_path, compression):
+    path = tmp_path / 'figures.tar'
+    with TarBundle(path, compression=compression) as bundle:
+        save(figure, 'figure', bundle=bundle, verbose=0)
+    with tarfile.open(path) as archive:
+        assert sorted(archive.getnames()) == ['figure.gfx.pdf', 'figure.tex']
+        graphics = archive.extractfile('figure.gfx.pdf').read()
+    assert graphics.startswith(b'%PDF')
+
+def test_bundle_with_cache_is_rejected(figure):
+    with pytest.raises(ValueError):
+        save(figure, 'figure', bundle=MemoryBundle(), cache=True, verbose=0)
+
+def test_bundle_without_open_is_rejected():
+    class Incomplete(Bundle):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,114 @@
+import os
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save
+from matplatex.latex_input import LaTeXinput
+
+OLD_TIME = 1_000_000_000
+
+
+@pytest.fixture
+def saved(figure, tmp_path):
+    """Save with cache and make the files look old."""
+    filename = tmp_path / 'figure'
+    save(figure, filename, cache=True, verbose=0)
+    paths = {'tex': tmp_path / 'figure.tex',
+             'graphics': tmp_path / 'figure.gfx.pdf'}
+    for path in paths.values():
+        os.utime(path, (OLD_TIME, OLD_TIME))
+    return filename, paths
+
+def is_rewritten(path):
+    return path.stat().st_mtime != OLD_TIME
+
+def test_unchanged_figure_is_skipped(figure, saved):
+    filename, paths = saved
+    save(figure, filename, cache=True, verbose=0)
+    assert not is_rewritten(paths['tex'])
+    assert not is_rewritten(paths['graphics'])
+
+def test_changed_data_is_rendered(figure, saved):
+    filename, paths = saved
+    figure.axes[0].lines[0].set_ydata([1, 1, 1])
+    save(figure, filename, cache=True, verbose=0)
+    assert is_rewritten(paths['graphics'])
+
+def test_changed_options_rewrite_tex_only(figure, saved):
+    filename, paths = saved
+    save(figure, filename, widthcommand=r'\linewidth', cache=True, verbose=0)
+    assert is_rewritten(paths['tex'])
+    assert not is_rewritten(paths['graphics'])
+
+def test_missing_file_is_written(figure, saved):
+    filename, paths = saved
+    paths['graphics'].unlink()
+    save(figure, filename, cache=True, verbose=0)
+    assert paths['graphics'].exists()
+    assert not is_rewritten(paths['tex'])
+
+def test_no_cache_always_writes(figure, saved):
+    filename, paths = saved
+    save(figure, filename, verbose=0)
+    assert is_rewritten(paths['tex'])
+    assert is_rewritten(paths['graphics'])
+
+def test_missing_format_is_written(figure, tmp_path):
+    filename = tmp_path / 'figure'
+    save(figure, filename, format=['pdf', 'png'], cache=True, verbose=0)
+    pdf_path = tmp_path / 'figure.gfx.pdf'
+    os.utime(pdf_path, (OLD_TIME, OLD_TIME))
+    (tmp_path / 'figure.gfx.png').unlink()
+    save(figure, filename, format=['pdf', 'png'], cache=True, verbose=0)
+    assert (tmp_path / 'figure.gfx.png').exists()
+    assert not is_rewritten(pdf_path)
+
+def test_changed_draw_anchors_is_rendered(figure, saved):
+    filename, paths = saved
+    save(figure, filename, draw_anchors=True, cache=True, verbose=0)
+    assert is_rewritten(paths['graphics'])
+
+def test_constrained_layout_is_skipped(tmp_path):
+    fig = plt.Figure(layout='constrained')
+    for ax in fig.subplots(2, 2).flat:
+        ax.plot([0, 1.3], [0, 2.7])
+        ax.set_xlabel("x axis label")
+        ax.set_title("title")
+    fig.suptitle("suptitle")
+    filename = tmp_path / 'figure'
+    pdf_path = tmp_path / 'figure.gfx.pdf'
+    save(fig, filename, format=['pdf', 'svg'], cache=True, verbose=0)
+    for _ in range(2):
+        os.utime(pdf_path, (OLD_TIME, OLD_TIME))
+        save(fig, filename, format=['pdf', 'svg'], cache=True, verbose=0)
+        assert not is_rewritten(pdf_path)
+
+def test_failed_write_is_retried(figure, saved, monkeypatch):
+    filename, paths = saved
+    figure.axes[0].set_xlabel("new label")
+    def fail(self, filename):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr(LaTeXinput, 'write', fail)
+        with pytest.raises(OSError):
+            save(figure, filename, cache=True, verbose=0)
+    save(figure, filename, cache=True, verbose=0)
+    assert "new label" in paths['tex'].read_text()
+
+def test_same_tex_as_without_cache(tmp_path):
+    def make_figure():
+        fig = plt.Figure(layout='constrained')
+        for ax in fig.subplots(2, 2).flat:
+            ax.plot([0, 1.3], [0, 2.7])
+            ax.set_xlabel("x axis label")
+        return fig
+    options = dict(format='svg', optimize=True, verbose=0)
+    with mpl.rc_context({'svg.hashsalt': 'matplatex'}):  # Fixed ids.
+        save(make_figure(), tmp_path / 'cached', cache=True, **options)
+        save(make_figure(), tmp_path / 'plain', **options)
+    assert ((tmp_path / 'cached.tex').read_text()
+            == (tmp_path / 'plain.tex').read_text().replace('plain', 'cached'))
+    assert ((tmp_path / 'cached.gfx.svg').read_text()
+            == (tmp_path / 'plain.gfx.svg').read_text())
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from matplatex.cli import build, find_scripts, main, watch
+
+SCRIPT = '''
+from pathlib import Path
+from matplotlib.figure import Figure
+
+INPUTS = ['data.txt']
+
+def plot():
+    fig = Figure()
+    values = (Path(__file__).parent / 'data.txt').read_text().split()
+    fig.add_subplot().plot([float(value) for value in values])
+    return fig
+
+FIGURES = {'plot': plot}
+'''
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'figures.py').write_text(SCRIPT)
+    (tmp_path / 'data.txt').write_text("1 3 2")
+    (tmp_path / 'helper.py').write_text("VALUE = 1\n")
+    (tmp_path / 'broken.py').write_text("FIGURES = {'broken': None}\n")
+    return tmp_path
+
+def test_find_scripts(project):
+    assert find_scripts([project]) == [project / 'broken.py',
+                                       project / 'figures.py']
+
+def test_build_is_incremental(project):
+    state_file = project / 'state.json'
+    options = dict(state_file=state_file, verbose=0)
+    summary = build([project / 'figures.py'], **options)
+    assert summary.exported == [project / 'figures.py']
+    assert (project / 'plot.tex').exists()
+    assert (project / 'plot.gfx.pdf').exists()
+
+    summary = build([project / 'figures.py'], **options)
+    assert summary.skipped == [project / 'figures.py']
+
+    (project / 'data.txt').write_text("1 3 2 4")
+    summary = build([project / 'figures.py'], **options)
+    assert summary.exported == [project / 'figures.py']
+
+    (project / 'plot.gfx.pdf').unlink()
+    summary = build([project / 'figures.py'], **options)
+    assert summary.exported == [project / 'figures.py']
+
+def test_failure_does_not_stop_build(project):
+    exit_code = main(['build', str(project), '-q', '--format', 'svg',
+                      '--state-file', str(project / 'state.json')])
+    assert exit_code == 1
+    assert (project / 'plot.gfx.svg').exists()
+
+def test_watch(project):
+    output = project / 'plot.tex'
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=([project / 'figures.py'],),
+                              kwargs=dict(interval=0.05, stop=stop, verbose=0,
+                                          state_file=project / 'state.json'))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not output.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        first = output.stat().st_mtime_ns
+        time.sleep(0.2)
+        assert output.stat().st_mtime_ns == first  # Not rebuilt needlessly.
+        (project / 'data.txt').write_text("5 1")
+        while (output.stat().st_mtime_ns == first
+               and time.monotonic() < deadline):
+            time.sleep(0.05)
+        assert output.stat().st_mtime_ns != first
+    finally:
+        stop.set()
+        thread.join()
+
+def test_changed_output_dir_is_exported(project):
+    options = dict(state_file=project / 'state.json', verbose=0)
+    build([project / 'figures.py'], **options)
+    summary = build([project / 'figures.py'], output_dir=project / 'out',
+                    **options)
+    assert summary.exported == [project / 'figures.py']
+    assert (project / 'out' / 'plot.tex').exists()
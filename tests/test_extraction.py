@@ -36,7 +36,7 @@ def test_get_text(make_simple_figure):
 
 def test_make_all_transparent(make_simple_figure):
     tools.make_all_transparent(make_simple_figure[0])
-    assert tools.extract_text(make_simple_figure[0]) == set()
+    assert tools.extract_text(make_simple_figure[0]) == []
 
 def test_restore_colors(make_simple_figure):
     initial_state = {t.mpl_text for t in
@@ -136,3 +136,29 @@ def test_ax_identification(figure_with_multiple_axes):
         result = text._ax
         expected = expected_by_text[text.text]
         assert result == expected
+
+def test_locate(figure_with_multiple_axes):
+    fig = figure_with_multiple_axes
+    located = list(tools.get_text_decendents(fig))
+    tools.locate(fig, located)
+    for element, reference in zip(located, tools.get_text_decendents(fig)):
+        assert tuple(element.position_in_figure) == pytest.approx(
+            tuple(reference.position_in_figure))
+        assert element.visible == reference.visible
+
+def test_walk_skips_leaves(figure_with_multiple_axes):
+    fig = figure_with_multiple_axes
+    ax = fig.get_axes()[0]
+    line, = ax.plot([0, 1], [0, 1])
+    line.get_children = None  # Would fail if the walk descended here.
+    texts = [text for text, _ in tools.walk_text(fig)]
+    assert {'figure text', 'ax1 text', 'ax2 text', 'label'} <= {
+        text.get_text() for text in texts}
+
+def test_make_all_transparent_with_texts(make_simple_figure):
+    fig = make_simple_figure[0]
+    texts = list(tools.get_text_decendents(fig))
+    removed_colors = tools.make_all_transparent(fig, texts)
+    assert tools.extract_text(fig) == []
+    tools.restore_colors(fig, removed_colors)
+    assert {t.mpl_text for t in tools.extract_text(fig)} == make_simple_figure[1]
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, save_frames, Beamer
+from matplatex.latex_input import LaTeXinput
+from matplatex.layout import TextRecord, overlay_specification, write_frames
+
+
+@pytest.fixture
+def figure():
+    fig = plt.Figure(figsize=(Beamer.width(169), 2.5))
+    ax = fig.add_subplot()
+    ax.plot([0, 1, 2], [2, 0, 1])
+    ax.set_xlabel("x axis label")
+    ax.annotate("first", (0.5, 1.5), visible=False)
+    ax.annotate("second", (1.5, 0.5), visible=False)
+    return fig
+
+def show(*texts):
+    def frame(fig):
+        for annotation in fig.axes[0].texts:
+            annotation.set_visible(annotation.get_text() in texts)
+    return frame
+
+def test_overlay_specification():
+    assert overlay_specification([1, 2, 3, 5, 7, 8]) == '1-3,5,7-8'
+    assert overlay_specification([4]) == '4'
+
+def test_save_frames(figure, tmp_path):
+    renders = []
+    savefig = figure.savefig
+    figure.savefig = lambda *args, **kwargs: renders.append(
+        savefig(*args, **kwargs))
+    frames = [show(), show('first'), show('first', 'second'), show('second')]
+    save_frames(figure, tmp_path / 'figure', frames, verbose=0)
+    assert len(list(tmp_path.glob('*.gfx.pdf'))) == 1
+    assert len(renders) == 1
+    lines = (tmp_path / 'figure.tex').read_text().splitlines()
+    first, = [line for line in lines if '{first}' in line]
+    second, = [line for line in lines if '{second}' in line]
+    label, = [line for line in lines if '{x axis label}' in line]
+    assert first.lstrip().startswith(r'\only<2-3>{\node')
+    assert second.lstrip().startswith(r'\only<3-4>{\node')
+    assert label.lstrip().startswith(r'\node')
+
+def test_visible_and_compact(figure, tmp_path):
+    save_frames(figure, tmp_path / 'figure', [show(), show('first')],
+                overlay='visible', compact=True, verbose=0)
+    code = (tmp_path / 'figure.tex').read_text()
+    assert r'\visible<2>{\node' in code
+    for line in code.splitlines():  # Styles must be defined outside overlays.
+        if line.lstrip().startswith(r'\visible'):
+            assert r'\tikzset' not in line
+
+def test_invalid_overlay(figure, tmp_path):
+    with pytest.raises(ValueError):
+        save_frames(figure, tmp_path / 'figure', [show()], overlay='onslide',
+                    verbose=0)
+
+def test_beamer_width():
+    assert Beamer.width(43) == pytest.approx(Beamer.full_width)
+    assert Beamer.width(169) == pytest.approx(Beamer.widescreen)
+    with pytest.raises(ValueError):
+        Beamer.width(11)
+
+def test_repeated_records():
+    record = TextRecord('same', 0.5, 0.5, 'center', 0, (0, 0, 0, 1), 10, False)
+    other = TextRecord('other', 0.1, 0.1, 'center', 0, (0, 0, 0, 1), 10, False)
+    output = LaTeXinput(widthcommand=r'\figurewidth', externalize=False,
+                        trim=False)
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    write_frames(output, [[record, record, other], [other], [record, other]])
+    output.close()
+    lines = output.latexcode.splitlines()
+    same = [line.strip() for line in lines if '{same}' in line]
+    assert [line.split('{', 1)[0] for line in same] == [
+        r'\only<1,3>', r'\only<1>']
+    other_line, = [line.strip() for line in lines if '{other}' in line]
+    assert other_line.startswith(r'\node')
+
+def test_arrow_on_later_frame_is_rejected(figure, tmp_path):
+    figure.axes[0].annotate("arrow", (1, 1), (0.5, 0.5), visible=False,
+                            arrowprops={'arrowstyle': '->'})
+    with pytest.raises(ValueError):
+        save_frames(figure, tmp_path / 'figure', [show(), show('arrow')],
+                    verbose=0)
+
+def test_changed_graphics_are_rejected(figure, tmp_path):
+    def recolor(fig):
+        fig.axes[0].lines[0].set_color('red')
+    with pytest.raises(ValueError):
+        save_frames(figure, tmp_path / 'figure', [show(), recolor], verbose=0)
+
+def test_same_layout_as_save(tmp_path):
+    def make_figure():
+        fig = plt.Figure(layout='constrained')
+        for ax in fig.subplots(2, 2).flat:
+            ax.plot([0, 1.3], [0, 2.7])
+            ax.set_xlabel("x axis label")
+        return fig
+    options = dict(format='svg', optimize=True, verbose=0)
+    with mpl.rc_context({'svg.hashsalt': 'matplatex'}):  # Fixed ids.
+        save(make_figure(), tmp_path / 'plain', **options)
+        save_frames(make_figure(), tmp_path / 'frames', [show()], **options)
+    assert ((tmp_path / 'frames.tex').read_text()
+            == (tmp_path / 'plain.tex').read_text().replace('plain', 'frames'))
+    assert ((tmp_path / 'frames.gfx.svg').read_text()
+            == (tmp_path / 'plain.gfx.svg').read_text())
@@ -0,0 +1,47 @@
+from subprocess import run
+import sys
+
+import pytest
+
+# Import time budget of import matplatex, in seconds.
+IMPORT_BUDGET = 0.05
+
+
+def run_python(code):
+    result = run([sys.executable, '-c', code],
+                 capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def test_import_does_not_load_matplotlib():
+    loaded = run_python(
+        "import sys, matplatex;"
+        "print('matplotlib' in sys.modules, 'beartype' in sys.modules)")
+    assert loaded == ['False', 'False']
+
+@pytest.mark.parametrize('name', ['save', 'save_many', 'save_async',
+                                  'SaveReport', 'compile_externalized',
+                                  'retex'])
+def test_names_do_not_load_pyplot(name):
+    loaded = run_python(
+        f"import sys; from matplatex import {name};"
+        "print('matplotlib.pyplot' in sys.modules)")
+    assert loaded == ['False']
+
+def test_import_time():
+    times = []
+    for _ in range(3):
+        result = run([sys.executable, '-X', 'importtime', '-c',
+                      'import matplatex'],
+                     capture_output=True, text=True, check=True)
+        line, = [line for line in result.stderr.splitlines()
+                 if line.endswith('| matplatex')]
+        times.append(int(line.split('|')[1])/1e6)
+    assert min(times) < IMPORT_BUDGET
+
+def test_lazy_names():
+    import matplatex
+    assert set(matplatex.__all__) <= set(dir(matplatex))
+    for name in matplatex.__all__:
+        assert getattr(matplatex, name) is not None
+    with pytest.raises(AttributeError):
+        matplatex.nonexistent
@@ -0,0 +1,40 @@
+import json
+import shutil
+
+import pytest
+
+from .latex_benchmark import BASELINE, find_regressions, run_cases
+
+pytestmark = pytest.mark.select_latex
+
+
+@pytest.fixture(scope='module')
+def results():
+    if shutil.which('pdflatex') is None:
+        pytest.skip("pdflatex not found")
+    return run_cases(sizes=(10, 100))
+
+def test_stats_are_recorded(results):
+    for result in results.values():
+        assert result['seconds'] > 0
+        assert result['memory'] > 0
+        assert result['pdf_size'] > 0
+
+def test_more_text_uses_more_memory(results):
+    for template in 'mwe', 'externalize':
+        for style in 'tikz', 'compact', 'pgf':
+            assert (results[f'{template}-{style}-100']['memory']
+                    > results[f'{template}-{style}-10']['memory'])
+
+def test_no_regressions(results):
+    if not BASELINE.exists():
+        pytest.skip("no baseline, store one with "
+                    "python -m tests.latex_benchmark --save-baseline")
+    assert find_regressions(results, json.loads(BASELINE.read_text())) == []
+
+def test_find_regressions():
+    baseline = {'case': {'seconds': 1.0, 'memory': 1000, 'pdf_size': 100}}
+    results = {'case': {'seconds': 1.2, 'memory': 1100, 'pdf_size': 100},
+               'new': {'seconds': 9.0, 'memory': 9000, 'pdf_size': 900}}
+    assert find_regressions(results, baseline) == [
+        "case memory: 1100 against 1000"]
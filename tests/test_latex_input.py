@@ -0,0 +1,113 @@
+from io import StringIO
+from pathlib import Path
+
+import pytest
+
+from matplatex.latex_input import LaTeXinput, PGFinput, atomic_open
+
+
+def fill(output):
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    for i in range(10):
+        output.add_text(f'text {i}', (i/10, 0.5), anchor='north')
+    output.close()
+
+@pytest.fixture
+def options():
+    return {'widthcommand': r'\figurewidth', 'externalize': True, 'trim': True}
+
+def test_sink_gets_same_code(options):
+    buffered = LaTeXinput(**options)
+    fill(buffered)
+    sink = StringIO()
+    fill(LaTeXinput(**options, sink=sink))
+    assert sink.getvalue() == buffered.latexcode
+
+def test_no_latexcode_with_sink(options):
+    output = LaTeXinput(**options, sink=StringIO())
+    with pytest.raises(AttributeError):
+        output.latexcode
+
+def test_write(options, tmp_path):
+    output = LaTeXinput(**options)
+    fill(output)
+    output.write(tmp_path / 'figure.tex')
+    assert (tmp_path / 'figure.tex').read_text() == output.latexcode
+    assert list(tmp_path.iterdir()) == [tmp_path / 'figure.tex']
+
+def test_atomic_open_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / 'figure.tex'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_open(path) as file:
+            file.write('half')
+            raise RuntimeError
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+def test_compact_shares_styles(options):
+    output = LaTeXinput(**options, compact=True)
+    fill(output)
+    assert output.latexcode.count(r'\tikzset') == 1
+    assert output.latexcode.count('[mplt0]') == 10
+    assert 'rotate=' not in output.latexcode
+    assert 'opacity=' not in output.latexcode
+
+def test_compact_is_smaller(options):
+    verbose = LaTeXinput(**options)
+    fill(verbose)
+    compact = LaTeXinput(**options, compact=True)
+    fill(compact)
+    assert len(compact.latexcode) < len(verbose.latexcode)
+
+def test_compact_colors(options):
+    output = LaTeXinput(**options, compact=True)
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    output.add_text('a', (0, 0), color=(1, 0, 0, 1))
+    output.add_text('b', (0, 0), color=(1, 0, 0, 1), rotation=90)
+    output.add_text('c', (0, 0))
+    assert output.latexcode.count(r'\definecolor') == 1
+    assert output.latexcode.count(r'\tikzset') == 2
+    assert r'\node at (0,0) {c};' in output.latexcode
+
+@pytest.mark.parametrize('precision, expected', [
+    (4, '(0.1235,0.5)'), (2, '(0.12,0.5)'), (0, '(0,0)')])
+def test_precision(options, precision, expected):
+    output = LaTeXinput(**options, compact=True, precision=precision)
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    output.add_text('text', (0.123456, 0.5))
+    assert expected in output.latexcode
+
+def test_pgf_uses_no_tikz(options):
+    output = PGFinput(**options)
+    fill(output)
+    code = output.latexcode
+    assert 'tikz' not in code.replace('Requires package pgf', '')
+    assert r'\node' not in code
+    assert code.count(r'\pgftext') == 11
+    assert r'\pgftext[at={\pgfpoint{0.3000\figurewidth}{0.5000\matplatextmp}},top]{text 3}' in code
+    assert r'\beginpgfgraphicnamed{figure.gfx_xt}' in code
+    assert r'\pgfusepath{use as bounding box}' in code
+
+def test_pgf_text_style(options):
+    output = PGFinput(**options, compact=True)
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    for i in range(3):
+        output.add_text('text', (0, 0), anchor='base east', rotation=90,
+                        color=(1, 0, 0, 0.5))
+    output.close()
+    code = output.latexcode
+    assert code.count(r'\definecolor') == 1
+    assert code.count(
+        r'\begin{pgfscope}\pgfsetfillopacity{0.5}\pgftext'
+        r"[at={\mpltp{0}{0}},base,right,rotate=90]"
+        r'{\color{mpltc0}text}\end{pgfscope}') == 3
+
+def test_pgf_mid_anchor_is_lowered(options):
+    output = PGFinput(**options)
+    output.includegraphics(Path('figure.gfx.pdf'), 0.75)
+    output.add_text('0.5', (0, 0.5), anchor='mid east', sizecmd=r'\small')
+    output.close()
+    assert (r'\pgftext[at={\pgfpoint{0.0000\figurewidth}'
+            r'{0.5000\matplatextmp}},base,right]'
+            r'{\raisebox{-.5ex}{\small 0.5}}') in output.latexcode
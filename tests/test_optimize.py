@@ -0,0 +1,33 @@
+import matplotlib as mpl
+import numpy as np
+import pytest
+
+from matplatex import save
+
+
+@pytest.fixture
+def figure(figure):
+    figure.axes[0].plot(np.random.default_rng(0).random(1000))
+    return figure
+
+@pytest.mark.parametrize('format', ['pdf', 'png', 'svg'])
+def test_optimized_files_are_smaller(figure, tmp_path, format):
+    save(figure, tmp_path / 'default', format=format, verbose=0)
+    save(figure, tmp_path / 'optimized', format=format, optimize=True,
+         verbose=0)
+    default = (tmp_path / f'default.gfx.{format}').read_bytes()
+    optimized = (tmp_path / f'optimized.gfx.{format}').read_bytes()
+    assert len(optimized) < len(default)
+    assert b'Matplotlib v' not in optimized
+    assert b'Matplotlib v' in default
+
+def test_rcparams_are_restored(figure, tmp_path):
+    compression = mpl.rcParams['pdf.compression']
+    save(figure, tmp_path / 'figure', optimize=True, verbose=0)
+    assert mpl.rcParams['pdf.compression'] == compression
+
+def test_optimize_invalidates_cache(figure, tmp_path):
+    save(figure, tmp_path / 'figure', cache=True, verbose=0)
+    report = save(figure, tmp_path / 'figure', cache=True, optimize=True,
+                  report=True, verbose=0)
+    assert str(tmp_path / 'figure.gfx.pdf') in report.written
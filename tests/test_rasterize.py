@@ -0,0 +1,48 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save
+from matplatex.tools import rasterization_dpi
+
+
+@pytest.fixture
+def figure_options():
+    return {'figsize': (4, 3)}
+
+@pytest.fixture
+def figure(figure):
+    ax = figure.axes[0]
+    ax.lines[0].set_color('#ff0000')
+    ax.scatter(*np.random.default_rng(0).random((2, 5000)), s=1)
+    return figure
+
+def count_images(path):
+    return path.read_text().count('<image')
+
+def test_no_rasterization_by_default(figure, tmp_path):
+    save(figure, tmp_path / 'figure', format='svg', verbose=0)
+    assert count_images(tmp_path / 'figure.gfx.svg') == 0
+
+def test_dense_artists_are_rasterized(figure, tmp_path):
+    save(figure, tmp_path / 'figure', format='svg', rasterize_threshold=1000,
+         verbose=0)
+    graphics = (tmp_path / 'figure.gfx.svg').read_text()
+    assert graphics.count('<image') == 1
+    assert '#ff0000' in graphics  # The sparse line is still a vector.
+    assert 'DejaVu' not in graphics
+
+def test_threshold_above_size(figure, tmp_path):
+    save(figure, tmp_path / 'figure', format='svg', rasterize_threshold=10_000,
+         verbose=0)
+    assert count_images(tmp_path / 'figure.gfx.svg') == 0
+
+def test_figure_is_unchanged(figure, tmp_path):
+    save(figure, tmp_path / 'figure', rasterize_threshold=1000, verbose=0)
+    ax = figure.axes[0]
+    assert not ax.collections[0].get_rasterized()
+    assert not ax.lines[0].get_rasterized()
+
+def test_rasterization_dpi():
+    assert rasterization_dpi(plt.Figure(figsize=(4, 3))) == 300
+    assert rasterization_dpi(plt.Figure(figsize=(20, 10))) == 200
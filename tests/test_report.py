@@ -0,0 +1,61 @@
+import pytest
+
+from matplatex import save, SaveReport
+from matplatex.tools import walk_text
+
+
+@pytest.fixture
+def figure(figure):
+    ax = figure.axes[0]
+    ax.set_title("invisible", visible=False)
+    ax.text(0.5, 0.5, "transparent", color='none')
+    ax.set_xticks([0, 1, 2], ["0", "", "2"])
+    ax.set_yticks([])
+    return figure
+
+def test_no_report_by_default(figure, tmp_path):
+    assert save(figure, tmp_path / 'figure', verbose=0) is None
+
+def test_report(figure, tmp_path):
+    report = save(figure, tmp_path / 'figure', report=True, verbose=0)
+    assert isinstance(report, SaveReport)
+    assert report.format == 'pdf'
+    assert report.counts['kept'] == 3
+    assert report.counts['transparent'] == 1
+    assert report.counts['invisible'] >= 1
+    assert report.counts['empty'] >= 1
+    assert sum(report.counts.values()) == len(list(walk_text(figure)))
+    graphics_size = (tmp_path / 'figure.gfx.pdf').stat().st_size
+    assert report.sizes == {
+        'tex': (tmp_path / 'figure.tex').stat().st_size,
+        'graphics.pdf': graphics_size,
+        'graphics': graphics_size}
+    assert {'extract', 'savefig', 'write_tex', 'write', 'total'} <= set(
+        report.times)
+    assert report.times['extract'] <= report.times['savefig']
+    assert len(report.written) == 2
+
+def test_report_callback(figure, tmp_path):
+    reports = []
+    returned = save(figure, tmp_path / 'figure', format='svg',
+                    report=reports.append, verbose=0)
+    assert returned is None
+    assert len(reports) == 1
+    assert reports[0].format == 'svg'
+    assert reports[0].as_dict()['counts']['kept'] == 3
+
+def test_report_with_cache(figure, tmp_path):
+    save(figure, tmp_path / 'figure', cache=True, verbose=0)
+    report = save(figure, tmp_path / 'figure', cache=True, report=True,
+                  verbose=0)
+    assert report.written == []
+    assert 'savefig' not in report.times
+    assert report.counts['kept'] == 3
+
+def test_report_several_formats(figure, tmp_path):
+    report = save(figure, tmp_path / 'figure', format=['pdf', 'png'],
+                  report=True, verbose=0)
+    assert report.format == ['pdf', 'png']
+    assert report.sizes['graphics'] == (report.sizes['graphics.pdf']
+                                        + report.sizes['graphics.png'])
+    assert len(report.written) == 3
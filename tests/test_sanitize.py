@@ -0,0 +1,41 @@
+import matplotlib.pyplot as plt
+
+from matplatex import save
+from matplatex.sanitize import Sanitizer, get_sanitizer, compile_table
+from matplatex.layout import replace_multiple
+
+
+def test_default_tables():
+    assert get_sanitizer('math')(r'$\mathdefault{−1}$') == '${-1}$'
+    assert get_sanitizer('text')('−1') == r'--\,1'
+
+def test_single_pass():
+    sanitizer = Sanitizer({'a': 'b', 'b': 'c'})
+    assert sanitizer('ab') == 'bc'
+
+def test_longest_key_first():
+    sanitizer = Sanitizer({'-': 'minus', '--': 'dash', 'x': 'y'})
+    assert sanitizer('a--b-c') == 'adashbminusc'
+
+def test_extra_replacements_take_precedence():
+    sanitizer = get_sanitizer('text', {'%': r'\%', '−': '-'})
+    assert sanitizer('5 % −1') == r'5 \% -1'
+
+def test_tables_are_reused():
+    assert get_sanitizer('math', {'%': r'\%'}) is get_sanitizer(
+        'math', {'%': r'\%'})
+    assert compile_table({'a': 'b'}) is compile_table({'a': 'b'})
+
+def test_empty_table():
+    assert Sanitizer({})('text') == 'text'
+    assert Sanitizer({'': 'x'})('text') == 'text'
+
+def test_replace_multiple():
+    assert replace_multiple('a−b', {'−': '-'}) == 'a-b'
+
+def test_save_with_replacements(tmp_path):
+    fig = plt.Figure()
+    fig.add_subplot().set_xlabel("50% & more")
+    save(fig, tmp_path / 'figure', replacements={'%': r'\%', '&': r'\&'},
+         verbose=0)
+    assert r'50\% \& more' in (tmp_path / 'figure.tex').read_text()
@@ -0,0 +1,161 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, tools
+from matplatex.latex_input import LaTeXinput
+from matplatex.tools import render_without_text
+
+
+@pytest.fixture
+def pyplot():
+    return True
+
+@pytest.fixture
+def figure_options():
+    return {'layout': 'constrained'}
+
+@pytest.fixture
+def figure(figure):
+    ax = figure.axes[0]
+    ax.lines[0].set_label('line')
+    ax.set_title("axis title", color='goldenrod')
+    ax.legend()
+    return figure
+
+@pytest.fixture
+def draw_counter(figure):
+    draws = []
+    figure.canvas.mpl_connect('draw_event', draws.append)
+    return draws
+
+def test_single_draw(figure, draw_counter, tmp_path):
+    """Regression benchmark: save used to draw the figure two or three times."""
+    save(figure, tmp_path / 'figure', verbose=0)
+    assert len(draw_counter) == 1
+
+def test_no_text_in_graphics(figure, tmp_path):
+    save(figure, tmp_path / 'figure', format='svg', verbose=0)
+    graphics = (tmp_path / 'figure.gfx.svg').read_text()
+    assert 'DejaVu' not in graphics  # The glyphs are named by the font.
+
+def test_text_which_is_not_extracted_stays_in_graphics(tmp_path):
+    # Table cells draw their text without listing it as a child.
+    fig, ax = plt.subplots()
+    ax.table([['CELLTEXT']])
+    ax.set_title('TITLETEXT')
+    with mpl.rc_context({'svg.fonttype': 'none'}):  # Keep text as text.
+        save(fig, tmp_path / 'figure', format='svg', verbose=0)
+    plt.close(fig)
+    graphics = (tmp_path / 'figure.gfx.svg').read_text()
+    tex = (tmp_path / 'figure.tex').read_text()
+    assert 'CELLTEXT' in graphics
+    assert 'TITLETEXT' not in graphics
+    assert 'TITLETEXT' in tex
+
+def test_figure_is_unchanged(figure, tmp_path):
+    ax = figure.axes[0]
+    layout_engine = figure.get_layout_engine()
+    save(figure, tmp_path / 'figure', verbose=0)
+    assert figure.get_layout_engine() is layout_engine
+    assert ax.title.get_color() == 'goldenrod'
+    assert ax.xaxis.label.get_color() == 'black'
+
+def test_anchors_are_not_added_to_figure(figure, tmp_path):
+    ax = figure.axes[0]
+    n_lines = len(ax.lines)
+    save(figure, tmp_path / 'figure', draw_anchors=True, verbose=0)
+    assert len(ax.lines) == n_lines
+
+def test_several_formats(figure, draw_counter, tmp_path):
+    save(figure, tmp_path / 'figure', format=['pdf', 'svg', 'png'], verbose=0)
+    for format in ['pdf', 'svg', 'png']:
+        assert (tmp_path / f'figure.gfx.{format}').exists()
+    assert 'figure.gfx.pdf' in (tmp_path / 'figure.tex').read_text()
+    assert 'DejaVu' not in (tmp_path / 'figure.gfx.svg').read_text()
+    assert len(draw_counter) == 3
+
+def test_tree_is_walked_once_per_save(figure, tmp_path, monkeypatch):
+    walks = []
+    for name in 'walk_text', '_text_owners':
+        walk = getattr(tools, name)
+        def counted(fig, /, walk=walk, name=name):
+            walks.append(name)
+            return walk(fig)
+        monkeypatch.setattr(tools, name, counted)
+    save(figure, tmp_path / 'figure', format=['pdf', 'svg', 'png'], verbose=0)
+    assert sorted(walks) == ['_text_owners', 'walk_text']
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_identical_figures_give_identical_tex(compact, tmp_path):
+    for name in 'first', 'second':
+        fig, ax = plt.subplots()
+        for i in range(20):
+            ax.annotate(f"{i}", (i/20, i/20), color=f'C{i % 10}')
+        ax.set_xlabel("x axis label")
+        save(fig, tmp_path / name, compact=compact, verbose=0)
+        plt.close(fig)
+    first = (tmp_path / 'first.tex').read_bytes()
+    second = (tmp_path / 'second.tex').read_bytes()
+    assert first == second.replace(b'second.gfx', b'first.gfx')
+    lines = first.decode().splitlines()
+    annotations = [line for line in lines if line.endswith(
+        tuple(f"{{{i}}};" for i in range(20)))]
+    assert annotations == sorted(annotations, key=lambda line: int(
+        line.rsplit('{', 1)[1].rstrip('};')))
+
+def test_layout_engine_is_never_changed(figure):
+    layout_engine = figure.get_layout_engine()
+    seen = []
+    figure.canvas.mpl_connect(
+        'draw_event', lambda event: seen.append(figure.get_layout_engine()))
+    with render_without_text(figure):
+        assert figure.get_layout_engine() is layout_engine
+        figure.draw_without_rendering()
+    assert seen == [layout_engine]
+
+def test_concurrent_saves_of_shared_figure(figure, tmp_path):
+    save(figure, tmp_path / 'reference', verbose=0)
+    reference = (tmp_path / 'reference.tex').read_text()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(save, figure, tmp_path / f'figure{i}',
+                                   verbose=0)
+                   for i in range(8)]
+        for future in futures:
+            future.result()
+    for i in range(8):
+        tex = (tmp_path / f'figure{i}.tex').read_text()
+        assert tex == reference.replace('reference.gfx', f'figure{i}.gfx')
+    assert 'draw' not in vars(figure)
+
+def test_draw_from_other_thread_has_text(figure, tmp_path):
+    with render_without_text(figure):
+        thread = threading.Thread(
+            target=figure.savefig, args=(tmp_path / 'other.svg',))
+        thread.start()
+        thread.join(timeout=0.5)
+        assert thread.is_alive()  # Waits for the figure's lock.
+    thread.join()
+    assert 'DejaVu' in (tmp_path / 'other.svg').read_text()
+
+def test_pgf_emitter(figure, tmp_path):
+    save(figure, tmp_path / 'figure', emitter='pgf', verbose=0)
+    tex = (tmp_path / 'figure.tex').read_text()
+    assert r'\pgftext' in tex
+    assert r'\node' not in tex
+    with pytest.raises(ValueError):
+        save(figure, tmp_path / 'figure', emitter='picture', verbose=0)
+
+def test_tex_is_streamed_without_cache(figure, tmp_path, monkeypatch):
+    sinks = []
+    init = LaTeXinput.__init__
+    def spy(self, *args, sink=None, **kwargs):
+        sinks.append(sink)
+        init(self, *args, sink=sink, **kwargs)
+    monkeypatch.setattr(LaTeXinput, '__init__', spy)
+    save(figure, tmp_path / 'figure', verbose=0)
+    assert sinks and None not in sinks
+    assert "x axis label" in (tmp_path / 'figure.tex').read_text()
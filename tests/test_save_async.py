@@ -0,0 +1,108 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, save_async, asave
+
+
+@pytest.fixture
+def pyplot():
+    return True
+
+@pytest.fixture
+def figure_options():
+    return {'layout': 'constrained'}
+
+@pytest.fixture
+def figure(figure):
+    figure.axes[0].lines[0].set_color('#0000ff')
+    return figure
+
+def test_save_async(figure, tmp_path):
+    future = save_async(figure, tmp_path / 'figure', verbose=0)
+    assert (tmp_path / 'figure.tex').exists()
+    assert future.result() == tmp_path / 'figure.gfx.pdf'
+    assert (tmp_path / 'figure.gfx.pdf').exists()
+
+def test_snapshot_is_rendered(figure, tmp_path):
+    """Changes made after save_async returns are not in the graphics."""
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(release.wait)
+        try:
+            future = save_async(figure, tmp_path / 'figure', format='svg',
+                                executor=executor, verbose=0)
+            figure.axes[0].lines[0].set_color('#ff0000')
+        finally:
+            release.set()
+        future.result()
+    graphics = (tmp_path / 'figure.gfx.svg').read_text()
+    assert '#0000ff' in graphics
+    assert '#ff0000' not in graphics
+    assert 'DejaVu' not in graphics
+
+def test_no_new_pyplot_figures(figure, tmp_path):
+    fignums = plt.get_fignums()
+    save_async(figure, tmp_path / 'figure', verbose=0).result()
+    assert plt.get_fignums() == fignums
+
+def test_render_error_is_raised(figure, tmp_path):
+    future = save_async(figure, tmp_path / 'figure', format='nonsense',
+                        verbose=0)
+    with pytest.raises(ValueError):
+        future.result()
+
+def test_asave(figure, tmp_path):
+    async def export():
+        return await asave(figure, tmp_path / 'figure', verbose=0)
+    assert asyncio.run(export()) == tmp_path / 'figure.gfx.pdf'
+    assert (tmp_path / 'figure.gfx.pdf').exists()
+
+def test_several_formats(figure, tmp_path):
+    future = save_async(figure, tmp_path / 'figure', format=['pdf', 'svg'],
+                        verbose=0)
+    assert future.result() == [tmp_path / 'figure.gfx.pdf',
+                               tmp_path / 'figure.gfx.svg']
+
+def test_concurrent_save(figure, tmp_path):
+    """The snapshot is not taken in the middle of a save."""
+    stop = threading.Event()
+    def save_repeatedly(name):
+        while not stop.is_set():
+            save(figure, tmp_path / name, verbose=0)
+    threads = [threading.Thread(target=save_repeatedly, args=(f'saved{i}',))
+               for i in range(2)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often, to hit the race.
+    try:
+        for thread in threads:
+            thread.start()
+        for _ in range(10):
+            save_async(figure, tmp_path / 'figure', verbose=0).result()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(interval)
+
+@pytest.mark.parametrize('layout', ['constrained', 'tight'])
+def test_same_files_as_save(tmp_path, layout):
+    def make_figure():
+        fig = plt.Figure(layout=layout)
+        for ax in fig.subplots(2, 2).flat:
+            ax.plot([0, 1.3], [0, 2.7])
+            ax.set_xlabel("x axis label")
+        return fig
+    options = dict(format='svg', optimize=True, verbose=0)
+    with mpl.rc_context({'svg.hashsalt': 'matplatex'}):  # Fixed ids.
+        save_async(make_figure(), tmp_path / 'async', **options).result()
+        save(make_figure(), tmp_path / 'plain', **options)
+    assert ((tmp_path / 'async.tex').read_text()
+            == (tmp_path / 'plain.tex').read_text().replace('plain', 'async'))
+    assert ((tmp_path / 'async.gfx.svg').read_text()
+            == (tmp_path / 'plain.gfx.svg').read_text())
@@ -0,0 +1,58 @@
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, save_many
+
+
+def make_line_figure():
+    fig = plt.Figure()
+    ax = fig.add_subplot()
+    ax.plot([0, 1, 2], [2, 0, 1], label='line')
+    ax.set_xlabel("x axis label")
+    ax.legend()
+    return fig
+
+def make_text_figure():
+    fig = plt.Figure(figsize=(4, 3))
+    fig.add_artist(plt.Text(0.3, 0.6, 'text', color='goldenrod'))
+    return fig
+
+def make_broken_figure():
+    raise ValueError("This figure is broken")
+
+@pytest.fixture
+def factories():
+    return {'line': make_line_figure, 'text': make_text_figure}
+
+def test_same_as_save(factories, tmp_path):
+    jobs = [(factory, tmp_path / f'{name}_parallel')
+            for name, factory in factories.items()]
+    failed = save_many(jobs, max_workers=2, verbose=0)
+    assert failed == {}
+    for name, factory in factories.items():
+        save(factory(), tmp_path / f'{name}_sequential', verbose=0)
+        parallel = tmp_path / f'{name}_parallel.tex'
+        sequential = tmp_path / f'{name}_sequential.tex'
+        assert parallel.read_text() == sequential.read_text().replace(
+            '_sequential', '_parallel')
+        assert (tmp_path / f'{name}_parallel.gfx.pdf').exists()
+
+def test_job_options(tmp_path):
+    jobs = [
+        (make_text_figure, tmp_path / 'default'),
+        (make_text_figure, tmp_path / 'png', {'format': 'png'}),
+        ]
+    save_many(jobs, max_workers=2, verbose=0)
+    assert (tmp_path / 'default.gfx.pdf').exists()
+    assert (tmp_path / 'png.gfx.png').exists()
+
+def test_errors_are_collected(tmp_path):
+    broken = tmp_path / 'broken'
+    jobs = [
+        (make_broken_figure, broken),
+        (make_text_figure, tmp_path / 'working'),
+        ]
+    failed = save_many(jobs, max_workers=2, verbose=0)
+    assert list(failed) == [str(broken)]
+    assert isinstance(failed[str(broken)], ValueError)
+    assert (tmp_path / 'working.tex').exists()
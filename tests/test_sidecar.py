@@ -0,0 +1,75 @@
+from subprocess import run
+import sys
+
+import matplotlib.pyplot as plt
+import pytest
+
+from matplatex import save, retex
+from matplatex.sidecar import read_layout
+
+
+@pytest.fixture
+def figure_options():
+    return {'figsize': (4, 3)}
+
+@pytest.fixture
+def figure(figure):
+    figure.axes[0].set_title("$y = f(x)$", color='goldenrod', rotation=10)
+    return figure
+
+def test_no_layout_by_default(figure, tmp_path):
+    save(figure, tmp_path / 'figure', verbose=0)
+    assert not (tmp_path / 'figure.layout.json').exists()
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'widthcommand': r'\linewidth', 'scale_fontsize': 0.8},
+    {'trim': True, 'externalize': True, 'compact': True},
+    {'emitter': 'pgf', 'precision': 2},
+    ])
+def test_retex_gives_same_tex(figure, tmp_path, options):
+    save(figure, tmp_path / 'figure', layout=True, verbose=0)
+    save(figure, tmp_path / 'expected', verbose=0, **options)
+    retex(tmp_path / 'figure.layout.json', verbose=0, **options)
+    expected = (tmp_path / 'expected.tex').read_text()
+    assert (tmp_path / 'figure.tex').read_text() == expected.replace(
+        'expected.gfx', 'figure.gfx')
+
+def test_layout_round_trip(figure, tmp_path):
+    save(figure, tmp_path / 'figure', layout=True, verbose=0)
+    layout = read_layout(tmp_path / 'figure.layout.json')
+    assert layout.graphics == 'figure.gfx.pdf'
+    assert layout.height_to_width == 0.75
+    title, = [record for record in layout.records
+              if record.text == "$y = f(x)$"]
+    assert title.rotation == 10
+    assert title.color == plt.matplotlib.colors.to_rgba('goldenrod')
+
+def test_retex_to_other_directory(figure, tmp_path):
+    save(figure, tmp_path / 'figure', layout=True, verbose=0)
+    (tmp_path / 'document').mkdir()
+    retex(tmp_path / 'figure.layout.json', tmp_path / 'document' / 'figure',
+          verbose=0)
+    tex = (tmp_path / 'document' / 'figure.tex').read_text()
+    assert '{../figure.gfx.pdf}' in tex
+
+def test_cli_does_not_import_matplotlib(figure, tmp_path):
+    save(figure, tmp_path / 'figure', layout=True, verbose=0)
+    (tmp_path / 'figure.tex').unlink()
+    result = run(
+        [sys.executable, '-c',
+         "import sys; from matplatex.cli import main;"
+         f"main(['retex', '-q', '--trim', {str(tmp_path / 'figure.layout.json')!r}]);"
+         "print('matplotlib' in sys.modules)"],
+        capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['False']
+    assert r'\begin{minipage}' in (tmp_path / 'figure.tex').read_text()
+
+def test_cache_rewrites_changed_layout(figure, tmp_path):
+    save(figure, tmp_path / 'figure', layout=True, cache=True, verbose=0)
+    figure.axes[0].xaxis.label.set_fontsize(30)
+    save(figure, tmp_path / 'figure', layout=True, cache=True, verbose=0)
+    layout = read_layout(tmp_path / 'figure.layout.json')
+    label, = [record for record in layout.records
+              if record.text == "x axis label"]
+    assert label.fontsize == 30